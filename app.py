@@ -1,21 +1,36 @@
 import os
 import logging
 
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash
+from flask import Flask, abort, render_template, redirect, send_file, url_for, flash, request, jsonify, session
 from flask_login import login_required, login_user, logout_user, current_user
 
-from sqlalchemy import select, or_, func
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, or_, func, union_all
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 
-from context import inject_calendar_share_status_enums, inject_theme_from_cookie, inject_user_profile_form
-from extensions import csrf, db, login_manager, mail
+from calendar_shares import DUPLICATE, MAX_RECIPIENTS, NOT_FOUND, OWNER, SENT, parse_identifiers, share_calendar
+from calendar_storage import calendar_storage
+from context import inject_calendar_share_status_enums, inject_calendar_srcset, inject_theme_from_cookie, inject_user_profile_form
+from db_profiles import configure_engine_profile, init_engine_profile
+from extensions import csrf, db, login_manager, mail, render_queue
 from forms import AddEventForm, ChangePasswordForm, EditEventForm, ForgotPasswordForm, LoginForm, ResetPasswordForm, ShareCalendarRequestForm, ShareCalendarResponseForm, SignUpForm, UserProfileForm, VerifyPasswordResetCodeForm
-from helpers import database_to_calendarview, generate_secure_code, get_or_create_calendar_image, inspire, send_reset_code_email, render_week_schedule, update_calendar_image
-from models import CalendarEvent, CalendarEventDay, CalendarImage, CalendarShare, CalendarShareStatus, NotepadData, PreviousPassword, ResetCode, User, UserTheme
+from helpers import CALENDAR_VARIANT_WIDTHS, calendar_render_exists, database_to_calendarview, find_calendar_render, generate_secure_code, get_calendar_events, get_daily_quote, open_calendar_render, send_reset_code_email, render_week_schedule, update_calendar_image, week_start
+from mail_outbox import mail_outbox
+from metrics import request_metrics
+from models import CalendarEvent, CalendarEventDay, CalendarImage, CalendarShare, CalendarShareStatus, NotepadData, ResetCode, User, UserTheme
+from notepad_ops import NoteOpError, apply_note_ops, with_item_ids
+from occurrences import add_event_occurrences, get_events_on
+from passwords import passwords
+from query_audit import register_query_audit
+from schedule_index import schedule_indexes
+from schema_upgrades import register_schema_upgrades, upgrade_schema
+from throttle import throttle
+from week_api import week_payload
 
 load_dotenv()
 
@@ -24,33 +39,77 @@ def create_app():
     app.config['APP_NAME'] = 'I.G.K.H.'
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
+    # Database engine profile: default, sqlite or postgresql (see db_profiles.py)
+    app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE', 'default')
     app.config['REMEMBER_COOKIE_DURATION'] = timedelta(days=7)
     # Email Information
-    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER')
-
+    app.config['MAIL_OUTBOX_INTERVAL'] = int(os.getenv('MAIL_OUTBOX_INTERVAL', 5))
+    app.config['MAIL_OUTBOX_RETENTION_DAYS'] = int(os.getenv('MAIL_OUTBOX_RETENTION_DAYS', 7))
+    # Passwords (stored hashes made with another method are upgraded on login)
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_CHECK_WORKERS'] = int(os.getenv('PASSWORD_CHECK_WORKERS', 4))
+    # Login and reset throttling: memory (per process), sqlite (shared by the workers on a host) or off
+    app.config['THROTTLE_BACKEND'] = os.getenv('THROTTLE_BACKEND', 'memory')
+    # Reverse proxies in front of the app whose X-Forwarded-For and X-Forwarded-Proto are trusted (0 trusts none)
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', 0))
+    # Calendar Rendering (0 renders inline on the request)
+    app.config['CALENDAR_IMAGE_DIR'] = 'static/images/calendar'
+    app.config['CALENDAR_STORAGE'] = os.getenv('CALENDAR_STORAGE', 'local')
+    app.config['CALENDAR_RENDER_WORKERS'] = int(os.getenv('CALENDAR_RENDER_WORKERS', 0))
+    app.config['CALENDAR_RENDER_ENGINE'] = os.getenv('CALENDAR_RENDER_ENGINE', 'calendar_view')
+    # Rendered weeks kept per user (bytes, and days since last viewed)
+    app.config['CALENDAR_CACHE_MAX_BYTES'] = int(os.getenv('CALENDAR_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+    app.config['CALENDAR_CACHE_MAX_AGE'] = int(os.getenv('CALENDAR_CACHE_MAX_AGE', 30))
+    # Recurring events are materialized this many days past the start of the current week
+    app.config['OCCURRENCE_WINDOW_DAYS'] = int(os.getenv('OCCURRENCE_WINDOW_DAYS', 56))
+    # Daily Quote
+    app.config['QUOTE_CACHE_PATH'] = os.getenv('QUOTE_CACHE_PATH', os.path.join(app.instance_path, 'quote_cache.json'))
+    os.makedirs(os.path.dirname(app.config['QUOTE_CACHE_PATH']), exist_ok=True)
+    # Request Metrics (0 disables the slow request log)
+    app.config['METRICS_SLOW_REQUEST_MS'] = int(os.getenv('METRICS_SLOW_REQUEST_MS', 0))
+
+    if app.config['TRUSTED_PROXIES']:
+        # Without this, request.remote_addr is the proxy and every client shares one throttle bucket.
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
+
+    request_metrics.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message = "Please sign in to continue."
     login_manager.login_message_category = "warning"
+    configure_engine_profile(app)
     db.init_app(app)
     mail.init_app(app)
+    mail_outbox.init_app(app)
+    passwords.init_app(app)
+    throttle.init_app(app)
     csrf.init_app(app)
+    render_queue.init_app(app)
+    calendar_storage.init_app(app)
     
     '''
     if code generates multiple context processors, use the following loop
     for processor in [processor1, processor2, processor3]:
         app.context_processor(processor)
     '''
-    for processor in [inject_calendar_share_status_enums, inject_theme_from_cookie, inject_user_profile_form]:
+    for processor in [inject_calendar_share_status_enums, inject_calendar_srcset, inject_theme_from_cookie, inject_user_profile_form]:
         app.context_processor(processor)
 
+    register_query_audit(app)
+    register_schema_upgrades(app)
+
     with app.app_context():
+        init_engine_profile(app, db.engine)
         db.create_all()
+        # create_all() leaves existing tables alone; add the columns they gained since.
+        for column in upgrade_schema(db.engine):
+            app.logger.warning(f"Added column {column} to the existing database")
 
     @app.route('/')
     def root():
@@ -64,9 +123,13 @@ app = create_app()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return db.session.get(User, int(user_id), options=[joinedload(User.theme)])
 
 #region --- Authentication and Registration Routes ---
+def too_many_attempts(retry_after, template, **context):
+    flash('Too many attempts. Please wait a few minutes and try again.', 'danger')
+    return render_template(template, **context), 429, {'Retry-After': str(retry_after)}
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -84,10 +147,12 @@ def login():
         form_type = request.form.get('form_type')
         if form_type == 'login' and login_form.validate_on_submit():
             identifier = login_form.identifier.data.strip()
+            if retry_after := throttle.hit('login', request.remote_addr, identifier):
+                return too_many_attempts(retry_after, 'login.html', **forms)
 
             stmt = select(User).where(or_(User.username == identifier, func.lower(User.email) == identifier.lower()))
             user = db.session.execute(stmt).scalar_one_or_none()
-            if user and check_password_hash(user.password, login_form.password.data):
+            if user and passwords.login(user, login_form.password.data):
                 login_user(user, remember=login_form.remember.data)
                 user.theme.theme = login_form.theme.data
                 db.session.commit()
@@ -108,7 +173,7 @@ def login():
                 last_name=signup_form.last_name.data.strip(),
                 username=signup_form.username.data,
                 email=signup_form.email.data.strip().lower(),
-                password=generate_password_hash(signup_form.password.data),
+                password=passwords.hash(signup_form.password.data),
             )
 
             user_theme = UserTheme(theme=signup_form.theme.data)
@@ -134,6 +199,9 @@ def forgot_password():
 
     if request.method == 'POST':
         if forgot_password_form.validate_on_submit():
+            if retry_after := throttle.hit('forgot_password', request.remote_addr, forgot_password_form.email.data):
+                return too_many_attempts(retry_after, 'forgot_password.html', forgot_password_form=forgot_password_form)
+
             existing_email = db.session.execute(select(User).where(
                 func.lower(User.email) == forgot_password_form.email.data.lower()
                 )
@@ -163,8 +231,9 @@ def forgot_password():
 
                 try:
                     db.session.add(reset_code)
-                    db.session.commit()
                     send_reset_code_email(existing_email.email, reset_code.code)
+                    db.session.commit()
+                    mail_outbox.notify()
                 except SQLAlchemyError as e:
                     logging.error(f"Reset code database error: {e}")
                     flash('Something went wrong. Please contact support.', 'danger')
@@ -181,6 +250,9 @@ def verify_password_reset_code():
 
     if request.method == 'POST':
         if verify_password_reset_code_form.validate_on_submit():
+            if retry_after := throttle.hit('verify_reset_code', request.remote_addr):
+                return too_many_attempts(retry_after, 'verify_password_reset_code.html', verify_password_reset_code_form=verify_password_reset_code_form)
+
             code = db.session.execute(select(ResetCode).where(
                 ResetCode.code == verify_password_reset_code_form.code.data
                 )
@@ -211,21 +283,11 @@ def reset_password():
         if reset_password_form.validate_on_submit():
             user = db.session.get(User, user_id)
 
-            if user.has_used_password(reset_password_form.password.data) or check_password_hash (user.password, reset_password_form.password.data):
+            if passwords.is_reused(user, reset_password_form.password.data):
                 flash('Please create a different password.', 'danger')
                 return render_template('reset_password.html', reset_password_form=reset_password_form)
 
-            db.session.add(PreviousPassword(
-                user_id=user.id,
-                previous_password=user.password,
-                change_date=datetime.now()
-            ))
-            user.password = generate_password_hash(reset_password_form.password.data)
-            db.session.commit()
-            db.session.refresh(user)
-            if len(user.previous_passwords) > 5:
-                for p in sorted(user.previous_passwords, key=lambda p: p.change_date)[:-5]:
-                    db.session.delete(p)
+            passwords.change(user, reset_password_form.password.data)
             db.session.commit()
 
             session.pop('code_verified_user_id', None)
@@ -308,24 +370,13 @@ def change_password():
             flash('Incorrect current password.', 'danger')
             return render_template('change_password.html', change_password_form=change_password_form)
 
-        if user.has_used_password(change_password_form.password.data) or check_password_hash (user.password, change_password_form.password.data):
+        if passwords.is_reused(user, change_password_form.password.data):
             flash('Please choose a different password.', 'danger')
             change_password_form.password.data = ''
             change_password_form.confirm_password.data = ''
             return render_template('change_password.html', change_password_form=change_password_form)
         
-        db.session.add(PreviousPassword(
-            user_id=user.id,
-            previous_password=user.password,
-            change_date=datetime.now()
-        ))
-
-        user.password = generate_password_hash(change_password_form.password.data)
-        db.session.commit()
-        db.session.refresh(user)
-        if len(user.previous_passwords) > 5:
-            for p in sorted(user.previous_passwords, key=lambda p: p.change_date)[:-5]:
-                db.session.delete(p)
+        passwords.change(user, change_password_form.password.data)
         db.session.commit()
 
         flash('Password changed successfully.', 'success')
@@ -339,21 +390,10 @@ def change_password():
 @login_required
 def dashboard():
     now = datetime.now()
-    today = now.strftime("%Y-%m-%d")
     current_time = now.time()
     current_date = now.date()
-    current_day_of_week = now.weekday()
-
-    if session.get("quote_date") != today:
-        quote_data = inspire()
-        session["quote"] = quote_data
-        session["quote_date"] = today
 
-    inspiration = session.get("quote")
-    quote = {
-        "text": inspiration[0]["q"],
-        "author": inspiration[0]["a"]
-    }
+    quote = get_daily_quote()
 
     notepad = db.session.execute(
         select(NotepadData)
@@ -361,19 +401,12 @@ def dashboard():
     ).scalars().first()
 
     if not notepad:
-        notepad = NotepadData(title='Title', body=[])
-
-    curent_events = (
-        db.session.execute(
-            select(CalendarEvent)
-            .filter(CalendarEvent.user_id == current_user.id,
-                or_(
-                    CalendarEvent.day == current_date,
-                    CalendarEvent.recurring_days.any(CalendarEventDay.day_of_week == current_day_of_week)
-                )
-            ).order_by(CalendarEvent.start)
-        ).scalars().all()
-    )
+        notepad = NotepadData(title='Title', body=[], version=0)
+    elif (body := with_item_ids(notepad.body)) is not None:
+        notepad.body = body
+        db.session.commit()
+
+    curent_events = get_events_on(current_user.id, current_date)
 
     share_request = db.session.execute(
             select(CalendarShare)
@@ -383,50 +416,97 @@ def dashboard():
 
     return render_template('dashboard.html.jinja', current_events=curent_events, share_request=share_request, current_time=current_time, current_date=current_date, notepad=notepad, quote=quote)
 
-@app.route('/api/notes', methods=['POST'])
+def note_state(note):
+    if not note:
+        return {'version': 0, 'title': 'Title', 'body': []}
+    return {'version': note.version, 'title': note.title, 'body': note.body}
+
+@app.route('/api/notes', methods=['PATCH'])
 @login_required
 def save_note():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     note = db.session.execute(
         select(NotepadData)
         .filter(NotepadData.user_id == current_user.id)
     ).scalars().first()
 
+    # Writes based on an older version are rejected with the current note so the client can replay its ops.
+    if data.get('version') != (note.version if note else 0):
+        return jsonify({'status': 'stale', **note_state(note)}), 409
+
+    try:
+        title, body = apply_note_ops(note.title if note else 'Title', note.body if note else [], data.get('ops', []))
+    except NoteOpError as e:
+        return jsonify({'status': 'invalid', 'error': str(e)}), 400
+
     if note:
-        note.title = data['title']
-        note.body = data['body']
+        if (title, body) == (note.title, note.body):
+            return jsonify({'status': 'saved', 'note_id': note.id, 'version': note.version})
+        note.title = title
+        note.body = body
     else:
-        note = NotepadData(
-            user_id=current_user.id,
-            title= data.get('title', 'Title'),
-            body=data['body']
-        )
+        note = NotepadData(user_id=current_user.id, title=title, body=body)
         db.session.add(note)
 
-    db.session.commit()
-    return jsonify({'status': 'saved', 'note_id': note.id})
+    try:
+        db.session.commit()
+    except (StaleDataError, IntegrityError):
+        # Another tab saved between our read and write.
+        db.session.rollback()
+        note = db.session.execute(
+            select(NotepadData)
+            .filter(NotepadData.user_id == current_user.id)
+        ).scalars().first()
+        return jsonify({'status': 'stale', **note_state(note)}), 409
+
+    return jsonify({'status': 'saved', 'note_id': note.id, 'version': note.version})
 
 #endregion
 
 #region --- Calendar Routes ---
 
+# calendar_view only draws years 1900 to 2100, and the weeks either side are rendered too.
+EARLIEST_WEEK = date(1900, 1, 15)
+LATEST_WEEK = date(2100, 12, 17)
+
+def requested_week(value):
+    try:
+        day = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return week_start(date.today())
+    return week_start(min(max(day, EARLIEST_WEEK), LATEST_WEEK))
+
+def get_viewable_calendar_image(token):
+    image = db.session.execute(select(CalendarImage).filter_by(secure_token=token)).scalar_one_or_none()
+    if not image:
+        abort(404)
+    if image.owner_id != current_user.id:
+        share = db.session.execute(
+            select(CalendarShare.id).filter_by(image_id=image.id, viewer_id=current_user.id, status=CalendarShareStatus.ACCEPTED)
+        ).first()
+        if not share:
+            abort(404)
+    return image
+
 @app.route('/week-schedule', methods=['GET', 'POST'])
 @login_required
 def week_schedule():
     add_event_form = AddEventForm()
     dow = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
     
-    database_events = db.session.execute(
-        select(CalendarEvent)
-        .options(selectinload(CalendarEvent.recurring_days))
-        .filter(CalendarEvent.user_id == current_user.id)
-        .order_by(CalendarEvent.start)
-    ).scalars().all()
+    database_events = get_calendar_events(current_user.id)
 
     edit_event_form = {e.id: EditEventForm(obj=e) for e in database_events}
-    events = database_to_calendarview(database_events)
-    render_week_schedule(current_user, events)
-    image = get_or_create_calendar_image(current_user.id)
+    week = requested_week(request.args.get('week'))
+    events = database_to_calendarview(database_events, week)
+    # With the render pool the page never waits on a render; a week drawn for the first time is swapped in by the browser.
+    image, version = render_week_schedule(current_user, events, week, background=render_queue.enabled)
+    pending = not calendar_render_exists(image, week, version)
+
+    # Render the neighbouring weeks in the background so paging to them is a cache hit.
+    if request.method == 'GET' and render_queue.enabled:
+        for adjacent in (week - timedelta(days=7), week + timedelta(days=7)):
+            render_week_schedule(current_user, database_to_calendarview(database_events, adjacent), adjacent, background=True)
 
     share_calendar_request_form = ShareCalendarRequestForm()
     share_calendar_request_form.image_id.data = image.id
@@ -446,30 +526,17 @@ def week_schedule():
             start_time = time.fromisoformat(add_event_form.start.data)
             end_time = time.fromisoformat(add_event_form.end.data)
 
-            if add_event_form.day.data:
-                conflict = db.session.execute(
-                    select(CalendarEvent)
-                    .filter(
-                        CalendarEvent.user_id == current_user.id,
-                        CalendarEvent.day == add_event_form.day.data,
-                        CalendarEvent.start < end_time,
-                        CalendarEvent.end > start_time
-                    )
-                ).scalars().first()
-            else:
-                conflict = db.session.execute(
-                    select(CalendarEvent)
-                    .join(CalendarEvent.recurring_days)
-                    .filter(
-                        CalendarEvent.user_id == current_user.id,
-                        CalendarEventDay.day_of_week.in_(add_event_form.day_of_week.data),
-                        CalendarEvent.start < end_time,
-                        CalendarEvent.end > start_time
-                    )
-                ).scalars().first()
+            schedule_index = schedule_indexes.get(current_user.id, database_events)
+            conflicts = schedule_index.conflicts(
+                start_time,
+                end_time,
+                day=add_event_form.day.data,
+                days_of_week=add_event_form.day_of_week.data if not add_event_form.day.data else ()
+            )
 
-            if conflict:
-                flash(f"Conflict with: '{conflict.title}'", 'warning')
+            if conflicts:
+                titles = ', '.join(f"'{title}'" for title in conflicts)
+                flash(f"Conflict with: {titles}", 'warning')
                 return redirect(url_for('week_schedule'))
 
             new_event = CalendarEvent(
@@ -492,7 +559,10 @@ def week_schedule():
                 db.session.add_all(recurring_days)
 
             try:
+                db.session.flush()
+                add_event_occurrences(new_event)
                 db.session.commit()
+                schedule_indexes.update(current_user.id, lambda index: index.add(new_event))
                 update_calendar_image(current_user.id)
                 flash('Schedule added successfully!', 'success')
             except SQLAlchemyError as e:
@@ -503,7 +573,14 @@ def week_schedule():
 
             return redirect(url_for('week_schedule'))
 
-    return render_template('week_schedule.html.jinja', **forms, dbe=database_events, dow=dow, image=image.secure_token)
+    weeks = {
+        'week': week,
+        'previous_week': week - timedelta(days=7),
+        'next_week': week + timedelta(days=7),
+        'this_week': week_start(date.today()),
+    }
+
+    return render_template('week_schedule.html.jinja', **forms, **weeks, dbe=database_events, dow=dow, image=image, version=version, pending=pending)
 
 @app.route('/edit-event/<int:event_id>', methods=['POST'])
 @login_required
@@ -527,6 +604,7 @@ def edit_event(event_id):
             event.notes = edit_event_form.notes.data
             event.color = edit_event_form.color.data
             db.session.commit()
+            schedule_indexes.update(current_user.id, lambda index: index.rename(event_id, edit_event_form.title.data))
             update_calendar_image(current_user.id)
             flash("Update sucessful!", "success")
         else:
@@ -542,75 +620,93 @@ def delete_event(event_id):
     if event and event.user_id == current_user.id:
         db.session.delete(event)
         db.session.commit()
+        schedule_indexes.update(current_user.id, lambda index: index.remove(event_id))
         update_calendar_image(current_user.id)
         flash("Event deleted sucessfully!", 'success')
     else:
         flash("Unauthorized", 'danger')
     return redirect(url_for('week_schedule'))
 
+SHARE_RESULT_MESSAGES = {
+    SENT: ("Share request sent to {}", 'success'),
+    NOT_FOUND: ("User not found: {}", 'danger'),
+    OWNER: ("You already have access to your own schedule.", 'info'),
+    DUPLICATE: ("Named more than once in this request: {}", 'info'),
+    'pending': ("Request previously sent and pending: {}", 'info'),
+    'declined': ("Request previously sent but declined: {}", 'warning'),
+    'accepted': ("Already has access: {}", 'info'),
+}
+
 @app.route('/share-calendar-request', methods=['POST'])
 @login_required
 def share_calendar_request():
-    identifier = request.form.get('identifier')
-    image_id = request.form.get('image_id')
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        identifiers = parse_identifiers(' '.join(map(str, data.get('identifiers') or [])))
+        image_id = data.get('image_id')
+    else:
+        identifiers = parse_identifiers(request.form.get('identifiers'))
+        image_id = request.form.get('image_id')
 
-    user = db.session.execute(
-        select(User).filter(
-            or_(User.username == identifier, User.email == identifier)
-        )
+    image = db.session.execute(
+        select(CalendarImage).filter(CalendarImage.id == image_id, CalendarImage.owner_id == current_user.id)
     ).scalar_one_or_none()
-
-    if not user:
-        flash("User not found", 'danger')
-        return redirect(url_for('week_schedule'))
-    
-    if user.id == current_user.id:
-        flash("You already have access to your own schedule.", 'info')
+    if not image:
+        abort(404)
+
+    if not identifiers or len(identifiers) > MAX_RECIPIENTS:
+        message = f"Enter between 1 and {MAX_RECIPIENTS} usernames or emails."
+        if request.is_json:
+            return jsonify({'error': message}), 400
+        flash(message, 'warning')
         return redirect(url_for('week_schedule'))
-    
-    existing = db.session.execute(
-        select(CalendarShare).filter_by(image_id=image_id, viewer_id=user.id)
-    ).scalar_one_or_none()
 
-    if existing:
-        if existing.status == CalendarShareStatus.PENDING:
-            flash("Request previously sent and pending.", 'info')
-        elif existing.status == CalendarShareStatus.DECLINED:
-            flash("Request previously sent but declined.", 'warning')
-        elif existing.status == CalendarShareStatus.ACCEPTED:
-            flash("That person already has access.", 'info')
-        return redirect(url_for('week_schedule'))
-    else:
-        share = CalendarShare(image_id=image_id, viewer_id=user.id)
-        db.session.add(share)
-        db.session.commit()
-        flash(f"Share request sent to {identifier}", 'success')
-        return redirect(url_for('week_share'))
+    results = share_calendar(image, identifiers)
+    db.session.commit()
+
+    if request.is_json:
+        return jsonify({'results': [{'identifier': identifier, 'result': result} for identifier, result in results]})
+
+    # One message per outcome, listing everyone it applies to.
+    grouped = {}
+    for identifier, result in results:
+        grouped.setdefault(result, []).append(identifier)
+    for result, names in grouped.items():
+        message, category = SHARE_RESULT_MESSAGES[result]
+        flash(message.format(', '.join(names)), category)
+    return redirect(url_for('week_share' if SENT in grouped else 'week_schedule'))
 
 @app.route('/week-share', methods=['GET', 'POST'])
 @login_required
 def week_share():
 
-    def get_request_by_status(viewer_id, status):
-        return db.session.execute(
-            select(CalendarShare)
-            .join(CalendarShare.image)
-            .filter(CalendarShare.viewer_id == viewer_id)
-            .filter(CalendarShare.status == status)
-            .order_by(CalendarImage.last_update.desc())
-        ).scalars().all()
-
-    accepted_requests = get_request_by_status(current_user.id, CalendarShareStatus.ACCEPTED)
-    pending_requests = get_request_by_status(current_user.id, CalendarShareStatus.PENDING)
-
-    sent_requests = db.session.execute(
+    # One query for all three lists, with the image owner and viewer joined in for the template.
+    # The received and sent shares are found with separate indexed selects; an OR across both would scan the table.
+    share_ids = union_all(
+        select(CalendarShare.id).filter(
+            CalendarShare.viewer_id == current_user.id,
+            CalendarShare.status.in_([CalendarShareStatus.ACCEPTED, CalendarShareStatus.PENDING])
+        ),
+        select(CalendarShare.id).join(CalendarShare.image).filter(CalendarImage.owner_id == current_user.id)
+    )
+    shares = db.session.execute(
         select(CalendarShare)
-        .join(CalendarImage, CalendarShare.image_id == CalendarImage.id)
-        .join(User, CalendarShare.viewer_id == User.id)
-        .filter(CalendarImage.owner_id == current_user.id)
-        .order_by(CalendarShare.status, User.username)
+        .join(CalendarShare.image)
+        .options(
+            contains_eager(CalendarShare.image).joinedload(CalendarImage.owner),
+            joinedload(CalendarShare.viewer)
+        )
+        .filter(CalendarShare.id.in_(share_ids))
+        .order_by(CalendarImage.last_update.desc())
     ).scalars().all()
 
+    accepted_requests = [share for share in shares if share.viewer_id == current_user.id and share.status == CalendarShareStatus.ACCEPTED]
+    pending_requests = [share for share in shares if share.viewer_id == current_user.id and share.status == CalendarShareStatus.PENDING]
+    sent_requests = sorted(
+        (share for share in shares if share.image.owner_id == current_user.id),
+        key=lambda share: (share.status, share.viewer.username)
+    )
+
     requests = {
         'accepted_requests': accepted_requests,
         'pending_requests': pending_requests,
@@ -619,7 +715,7 @@ def week_share():
 
     share_calendar_response_form = {req.id: ShareCalendarResponseForm(request_id=req.id) for req in pending_requests}
 
-    return render_template('week_share.html.jinja', **requests, share_calendar_response_form=share_calendar_response_form)
+    return render_template('week_share.html.jinja', **requests, share_calendar_response_form=share_calendar_response_form, week=week_start(date.today()))
 
 @app.route('/share-response/<int:request_id>', methods=['POST'])
 @login_required
@@ -649,7 +745,7 @@ def delete_calendar_share_request(request_id):
 
     share = db.session.execute(
         select(CalendarShare)
-        .options(joinedload(CalendarShare.image))
+        .options(joinedload(CalendarShare.viewer))
         .where(CalendarShare.id == request_id)
     ).scalar_one_or_none()
 
@@ -664,7 +760,7 @@ def delete_calendar_share_request(request_id):
 @login_required
 def delete_accepted_calendar_share(request_id):
 
-    share = db.session.get(CalendarShare, request_id)
+    share = db.session.get(CalendarShare, request_id, options=[joinedload(CalendarShare.image).joinedload(CalendarImage.owner)])
 
     if not share or share.viewer_id != current_user.id or share.status != CalendarShareStatus.ACCEPTED:
         flash("Unauthorized", 'danger')
@@ -681,7 +777,42 @@ def delete_accepted_calendar_share(request_id):
 @login_required
 def print_calendar(image):
     img_source = request.args.get('img_source')
-    return render_template('print_calendar.html.jinja', image=image, img_source=img_source)
+    image = get_viewable_calendar_image(image)
+    week = requested_week(request.args.get('week'))
+    version = request.args.get('version', image.version)
+    return render_template('print_calendar.html.jinja', image=image, week=week, version=version, img_source=img_source)
+
+@app.route('/calendar-image/<token>/<week>/<version>.png')
+@app.route('/calendar-image/<token>/<week>/<version>/<variant>.png')
+@login_required
+def calendar_image(token, week, version, variant=None):
+    if variant and variant not in CALENDAR_VARIANT_WIDTHS:
+        abort(404)
+    image = get_viewable_calendar_image(token)
+    week = requested_week(week)
+    render = find_calendar_render(image, week, version)
+    if not render:
+        abort(404)
+
+    try:
+        stream = open_calendar_render(image, render, variant)
+    except FileNotFoundError:
+        abort(404)
+    response = send_file(stream, mimetype='image/png', etag=render.version, last_modified=render.modified, conditional=True)
+    response.cache_control.private = True
+    if render.week == week.isoformat() and render.version == version:
+        # A new render gets a new URL, so this one never has to be revalidated.
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+@app.route('/api/week')
+@login_required
+def api_week():
+    week = requested_week(request.args.get('week'))
+    payload = week_payload(current_user.id, get_calendar_events(current_user.id), week, request.args.get('since'))
+    return jsonify(payload)
 
 #endregion
 
@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+
+from datetime import date, time, timedelta
+
+from flask import url_for
+
+# Benchmarks run against an in-memory database and never touch the configured one.
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# calendar_view logs a warning for every synthetic event outside the rendered week.
+logging.getLogger('calendar_view').setLevel(logging.ERROR)
+
+from app import app
+from calendar_storage import LocalCalendarStorage, calendar_storage
+from extensions import db, render_queue
+from helpers import database_to_calendarview, generate_time_choices, generate_unique_token, get_calendar_events, get_or_create_calendar_image, hex_to_rgba, render_week_schedule
+from models import CalendarEvent, CalendarEventDay, User
+
+# Share of one-time events in each synthetic schedule; the rest recur on 1-4 weekdays.
+MIXES = {'one-time': 1.0, 'mixed': 0.5, 'recurring': 0.0}
+COLORS = ['#0F52BA', '#E0115F', '#50C878', '#FFBF00', '#9966CC', '#FF7F50']
+
+def build_schedule(user_id, size, one_time_share, seed):
+    rnd = random.Random(seed)
+    today = date.today()
+    events = []
+    for i in range(size):
+        start = rnd.randrange(0, 23 * 60, 30)
+        end = min(start + rnd.choice([30, 60, 90, 120, 180]), 23 * 60 + 59)
+        event = CalendarEvent(
+            user_id=user_id,
+            title=f"Event {i}",
+            notes=rnd.choice([None, 'Bring notes', 'Room 4B']),
+            start=time(start // 60, start % 60),
+            end=time(end // 60, end % 60),
+            color=rnd.choice(COLORS),
+        )
+        if rnd.random() < one_time_share:
+            event.day = today + timedelta(days=rnd.randint(-7, 14))
+        else:
+            event.recurring_days = [CalendarEventDay(day_of_week=d) for d in rnd.sample(range(7), rnd.randint(1, 4))]
+        events.append(event)
+    db.session.add_all(events)
+    db.session.commit()
+
+def create_user(name):
+    user = User(first_name=name, last_name='Bench', username=name, email=f"{name}@bench.local", password='-')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def measure(fn, repeat, items=1):
+    samples = []
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        fn()
+        samples.append(timer.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        'p50_ms': statistics.median(samples) * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'throughput_per_s': items / statistics.mean(samples),
+        'peak_kib': peak / 1024,
+        'repeat': repeat,
+    }
+
+def run(sizes, render_sizes, repeat, seed):
+    results = {}
+    app.config['CALENDAR_RENDER_WORKERS'] = 0
+
+    # Renders go to a directory of their own that is removed afterwards, even if a benchmark fails.
+    with tempfile.TemporaryDirectory(prefix='igkh-bench-') as image_dir, app.test_request_context():
+        calendar_storage.backend = LocalCalendarStorage(image_dir)
+        results['generate_time_choices'] = measure(generate_time_choices, repeat * 10)
+        results['hex_to_rgba'] = measure(lambda: [hex_to_rgba(color, 192) for color in COLORS], repeat * 10, len(COLORS))
+        results['generate_unique_token'] = measure(generate_unique_token, repeat * 10)
+
+        for size in sizes:
+            for mix, one_time_share in MIXES.items():
+                user = create_user(f"bench{size}{mix.replace('-', '')}")
+                build_schedule(user.id, size, one_time_share, seed + size)
+                rows = get_calendar_events(user.id)
+
+                results[f"database_to_calendarview[{size},{mix}]"] = measure(lambda: database_to_calendarview(rows), repeat, size)
+
+                if size not in render_sizes:
+                    continue
+                for engine in ('calendar_view', 'native'):
+                    app.config['CALENDAR_RENDER_ENGINE'] = engine
+
+                    def render_cold():
+                        shutil.rmtree(calendar_storage.backend.directory(get_or_create_calendar_image(user.id).secure_token), ignore_errors=True)
+                        render_week_schedule(user, database_to_calendarview(rows))
+
+                    results[f"render_week_schedule[{size},{mix},{engine}]"] = measure(render_cold, repeat)
+                results[f"render_week_schedule[{size},{mix},cached]"] = measure(lambda: render_week_schedule(user, database_to_calendarview(rows)), repeat)
+
+        for size in sorted(render_sizes):
+            results.update(week_page(size, repeat, seed))
+
+    return results
+
+def week_page(size, repeat, seed):
+    '''
+    Time a request to the week page holds its worker for a week that was never drawn,
+    rendering inline versus handing the render to the pool.
+    '''
+    results = {}
+    user = create_user(f"page{size}")
+    build_schedule(user.id, size, MIXES['mixed'], seed + size)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+    # Three weeks apart, so the pool's prefetch of adjacent weeks never warms the next request.
+    weeks = itertools.count(3, 3)
+    for mode, workers in (('inline', 0), ('offloaded', 2)):
+        app.config['CALENDAR_RENDER_WORKERS'] = workers
+        render_queue.init_app(app)
+
+        def cold_page():
+            week = date.today() + timedelta(days=7 * next(weeks))
+            assert client.get(url_for('week_schedule', week=week.isoformat())).status_code == 200
+
+        results[f"week_page[{size},mixed,{mode}]"] = measure(cold_page, repeat)
+        render_queue.shutdown()
+    app.config['CALENDAR_RENDER_WORKERS'] = 0
+    return results
+
+def report(results, baseline=None, threshold=0.1):
+    print(f"{'benchmark':<52} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>12} {'peak KiB':>10}  vs baseline")
+    regressions = []
+    for name, r in results.items():
+        change = ''
+        if baseline and name in baseline:
+            delta = (r['p50_ms'] - baseline[name]['p50_ms']) / baseline[name]['p50_ms']
+            change = f"{delta:+.1%}"
+            if delta > threshold:
+                change += '  REGRESSION'
+                regressions.append(name)
+        print(f"{name:<52} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['throughput_per_s']:>12.1f} {r['peak_kib']:>10.1f}  {change}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the helpers.py hot paths on seeded synthetic schedules.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help='event counts per schedule')
+    parser.add_argument('--render-sizes', type=int, nargs='+', default=[10, 100], help='event counts that are also rendered to PNG')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per benchmark')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare p50 against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='p50 slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    results = run(args.sizes, set(args.render_sizes), args.repeat, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'seed': args.seed, 'results': results}, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import re
+
+from sqlalchemy import func, insert, or_, select
+
+from extensions import db
+from models import CalendarShare, CalendarShareStatus, User
+
+MAX_RECIPIENTS = 100
+
+# What happened for each recipient; existing shares report their status instead.
+SENT = 'sent'
+NOT_FOUND = 'not_found'
+OWNER = 'owner'
+DUPLICATE = 'duplicate'
+EXISTING = {
+    CalendarShareStatus.PENDING: 'pending',
+    CalendarShareStatus.DECLINED: 'declined',
+    CalendarShareStatus.ACCEPTED: 'accepted',
+}
+
+def parse_identifiers(text):
+    '''
+    Usernames or emails separated by commas, semicolons or whitespace, without repeats.
+    '''
+    identifiers = {}
+    for identifier in re.split(r'[\s,;]+', text or ''):
+        if identifier:
+            identifiers.setdefault(identifier.lower(), identifier)
+    return list(identifiers.values())
+
+def share_calendar(image, identifiers):
+    '''
+    Sends share requests for image to every identifier in one lookup, one existence check and one insert.
+    Returns (identifier, outcome) in the order given; a user named again by another identifier is a DUPLICATE.
+    Commit is left to the caller.
+    '''
+    lowered = [identifier.lower() for identifier in identifiers]
+    users = db.session.execute(
+        select(User.id, User.username, User.email)
+        .filter(or_(func.lower(User.username).in_(lowered), func.lower(User.email).in_(lowered)))
+    ).all()
+    by_identifier = {}
+    for user in users:
+        by_identifier[user.username.lower()] = user.id
+        by_identifier[user.email.lower()] = user.id
+
+    viewer_ids = set(by_identifier.values()) - {image.owner_id}
+    existing = dict(db.session.execute(
+        select(CalendarShare.viewer_id, CalendarShare.status)
+        .filter(CalendarShare.image_id == image.id, CalendarShare.viewer_id.in_(viewer_ids))
+    ).all()) if viewer_ids else {}
+
+    results, new_viewers, seen = [], [], set()
+    for identifier in identifiers:
+        user_id = by_identifier.get(identifier.lower())
+        if user_id is None:
+            results.append((identifier, NOT_FOUND))
+        elif user_id in seen:
+            # A username and an email of the same person get one request, reported on the first of them.
+            results.append((identifier, DUPLICATE))
+        elif user_id == image.owner_id:
+            results.append((identifier, OWNER))
+        elif user_id in existing:
+            results.append((identifier, EXISTING[CalendarShareStatus(existing[user_id])]))
+        else:
+            new_viewers.append(user_id)
+            results.append((identifier, SENT))
+        if user_id is not None:
+            seen.add(user_id)
+
+    if new_viewers:
+        db.session.execute(insert(CalendarShare), [
+            {'image_id': image.id, 'viewer_id': viewer_id, 'status': CalendarShareStatus.PENDING}
+            for viewer_id in new_viewers
+        ])
+    return results
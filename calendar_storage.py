@@ -0,0 +1,255 @@
+import os
+import shutil
+import threading
+import time
+
+from types import SimpleNamespace
+
+import click
+from sqlalchemy import select
+
+from extensions import db
+from models import CalendarImage
+
+SHARD_LENGTH = 2
+# Unfinished files older than this are left over from a render that died before its rename.
+LEFTOVER_SECONDS = 3600
+RENDER_SUFFIXES = ('.png', '.tmp')
+
+def holds_only_renders(path):
+    return all(entry.is_file() and entry.name.endswith(RENDER_SUFFIXES) for entry in os.scandir(path))
+
+class LocalCalendarStorage:
+    '''
+    Rendered weeks on the local disk under CALENDAR_IMAGE_DIR, one directory per CalendarImage token,
+    sharded by the token's first characters so no single directory holds more than a few thousand entries.
+    Files are addressed by (token, name). The backend is passed to render pool jobs, so it holds no app state.
+    '''
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['CALENDAR_IMAGE_DIR'])
+
+    def directory(self, token):
+        return os.path.join(self.root, token[:SHARD_LENGTH], token)
+
+    def path(self, token, name):
+        return os.path.join(self.directory(token), name)
+
+    def write(self, token, name, data):
+        '''
+        Stores data as name. It is written next to the target and swapped in, so readers never see part of a file.
+        '''
+        path = self.path(token, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def exists(self, token, name):
+        return os.path.exists(self.path(token, name))
+
+    def open(self, token, name):
+        '''
+        A binary file object for reading name; raises FileNotFoundError if it is gone.
+        '''
+        return open(self.path(token, name), 'rb')
+
+    def list(self, token):
+        '''
+        (name, size, accessed, modified) of every finished file stored for token.
+        '''
+        try:
+            entries = list(os.scandir(self.directory(token)))
+        except FileNotFoundError:
+            return []
+        files = []
+        for entry in entries:
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append(SimpleNamespace(name=entry.name, size=stat.st_size, accessed=stat.st_atime, modified=stat.st_mtime))
+        return files
+
+    def remove(self, token, name):
+        try:
+            os.remove(self.path(token, name))
+        except FileNotFoundError:
+            pass
+
+    def mark_viewed(self, token, name):
+        # Last access time orders the cache; the modified time stays the render time for Last-Modified.
+        path = self.path(token, name)
+        try:
+            stat = os.stat(path)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            pass
+
+    def scan(self):
+        '''
+        Yields (token, path) for every image directory, and (None, path) for renders left in the older layouts:
+        PNGs directly under the root and unsharded token directories. Anything else is left alone.
+        '''
+        try:
+            shards = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if shard.is_dir() and len(shard.name) == SHARD_LENGTH:
+                for entry in os.scandir(shard.path):
+                    if entry.is_dir() and entry.name.startswith(shard.name):
+                        yield entry.name, entry.path
+            elif shard.name.endswith(RENDER_SUFFIXES) or (shard.is_dir() and holds_only_renders(shard.path)):
+                yield None, shard.path
+
+    def discard(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def remove_directory(self, path):
+        # rmdir only removes an empty directory, so one a render has just written into stays.
+        try:
+            os.rmdir(path)
+        except OSError:
+            return 0
+        return 1
+
+    def remove_empty_directories(self):
+        '''
+        Removes token directories that cache pruning emptied at least LEFTOVER_SECONDS ago,
+        then shard directories left with nothing in them. Returns how many were removed.
+        '''
+        removed = 0
+        cutoff = time.time() - LEFTOVER_SECONDS
+        try:
+            shards = [entry for entry in os.scandir(self.root) if entry.is_dir() and len(entry.name) == SHARD_LENGTH]
+        except FileNotFoundError:
+            return 0
+        for shard in shards:
+            for entry in os.scandir(shard.path):
+                # A directory is made just before its first file is written, so recent empty ones are left alone.
+                if entry.is_dir() and entry.name.startswith(shard.name) and entry.stat().st_mtime < cutoff:
+                    removed += self.remove_directory(entry.path)
+            removed += self.remove_directory(shard.path)
+        return removed
+
+    def remove_leftovers(self, path):
+        '''
+        Removes what a render that died part way leaves behind: temp files,
+        and downscaled variants made while their full image was being pruned.
+        '''
+        removed = 0
+        cutoff = time.time() - LEFTOVER_SECONDS
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return 0
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            parts = entry.name.split('.')
+            # <week>.<version>.<variant>.png without its <week>.<version>.png
+            orphan_variant = len(parts) == 4 and parts[3] == 'png' and f"{parts[0]}.{parts[1]}.png" not in names
+            if (entry.name.endswith('.tmp') or orphan_variant) and entry.stat().st_mtime < cutoff:
+                self.discard(entry.path)
+                removed += 1
+        return removed
+
+    def usage(self):
+        images = files = size = 0
+        for token, path in self.scan():
+            images += bool(token)
+            for directory, _, names in os.walk(path) if os.path.isdir(path) else [('', [], [path])]:
+                for name in names:
+                    try:
+                        size += os.stat(os.path.join(directory, name)).st_size
+                    except FileNotFoundError:
+                        continue
+                    files += 1
+        return {'images': images, 'files': files, 'bytes': size}
+
+STORAGE_BACKENDS = {
+    'local': LocalCalendarStorage,
+}
+
+class CalendarStorage:
+    '''
+    Where rendered calendar weeks are kept (CALENDAR_STORAGE), and reconciliation of that store
+    against CalendarImage rows: directories whose token no longer exists are removed.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('CALENDAR_STORAGE', 'local')
+        name = app.config['CALENDAR_STORAGE']
+        if name not in STORAGE_BACKENDS:
+            raise RuntimeError(f"Unknown CALENDAR_STORAGE {name!r}, expected one of: {', '.join(STORAGE_BACKENDS)}")
+        self.backend = STORAGE_BACKENDS[name].from_config(app.config)
+        app.cli.command('calendar-gc')(self._gc_command)
+        app.cli.command('calendar-usage')(self._usage_command)
+
+    def collect_garbage(self, batch_size=500):
+        '''
+        Removes image directories without a CalendarImage row, anything outside the storage layout,
+        files left by interrupted renders, and the directories all that leaves empty. Returns counts of what was removed.
+        '''
+        removed = {'orphans': 0, 'strays': 0, 'leftovers': 0, 'directories': 0}
+        batch = []
+
+        def reconcile():
+            tokens = [token for token, _ in batch]
+            live = set(db.session.execute(
+                select(CalendarImage.secure_token)
+                .filter(CalendarImage.secure_token.in_(tokens))
+            ).scalars())
+            for token, path in batch:
+                if token in live:
+                    removed['leftovers'] += self.backend.remove_leftovers(path)
+                else:
+                    self.backend.discard(path)
+                    removed['orphans'] += 1
+            batch.clear()
+
+        for token, path in self.backend.scan():
+            if token is None:
+                self.backend.discard(path)
+                removed['strays'] += 1
+                continue
+            batch.append((token, path))
+            if len(batch) >= batch_size:
+                reconcile()
+        if batch:
+            reconcile()
+        removed['directories'] = self.backend.remove_empty_directories()
+        return removed
+
+    def usage(self):
+        return self.backend.usage()
+
+    def _gc_command(self):
+        '''Remove calendar renders that no longer belong to a calendar image.'''
+        removed = self.collect_garbage()
+        click.echo(f"Removed {removed['orphans']} orphaned image(s), {removed['strays']} stray file(s), {removed['leftovers']} unfinished render file(s) and {removed['directories']} empty folder(s).")
+
+    def _usage_command(self):
+        '''Show the disk usage of the calendar render store.'''
+        usage = self.usage()
+        click.echo(f"{usage['images']} image(s), {usage['files']} file(s), {usage['bytes'] / 1024 / 1024:.1f} MiB")
+
+calendar_storage = CalendarStorage()
@@ -1,19 +1,32 @@
-from flask import request
+from flask import g, request, url_for
 from flask_login import current_user
+from werkzeug.local import LocalProxy
 
-from models import db, CalendarShareStatus, User
+from models import CalendarShareStatus
 from forms import UserProfileForm
+from helpers import CALENDAR_VARIANT_WIDTHS
 
 def inject_theme_from_cookie():
     theme = request.cookies.get('theme', 'dark')
     return {'cookie_theme': theme}
 
+def get_user_profile_form():
+    # Built on first use in a template and reused for the rest of the request.
+    if 'user_profile_form' not in g:
+        g.user_profile_form = UserProfileForm(obj=current_user._get_current_object()) if current_user.is_authenticated else None
+    return g.user_profile_form
+
 def inject_user_profile_form():
-    if current_user.is_authenticated:
-        user = db.session.get(User, current_user.id)
-        return dict(user_profile_form=UserProfileForm(obj=user))
-    return dict(user_profile_form=None)
+    return dict(user_profile_form=LocalProxy(get_user_profile_form))
 
 def inject_calendar_share_status_enums():
     return dict(CalendarShareStatus=CalendarShareStatus)
 
+def calendar_srcset(token, week, version):
+    return ', '.join(
+        f"{url_for('calendar_image', token=token, week=week, version=version, variant=variant)} {width}w"
+        for variant, width in CALENDAR_VARIANT_WIDTHS.items()
+    )
+
+def inject_calendar_srcset():
+    return dict(calendar_srcset=calendar_srcset)
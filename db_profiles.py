@@ -0,0 +1,98 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine options and connection setup per deployment type, picked with DB_ENGINE_PROFILE.
+ENGINE_PROFILES = {
+    # SQLAlchemy's defaults; works with any database, including in-memory SQLite.
+    'default': {
+        'dialect': None,
+        'engine_options': {},
+        'pragmas': {},
+    },
+    # Single-node deployments on a SQLite file. WAL lets readers run alongside the writer,
+    # and busy_timeout makes writers queue instead of failing with "database is locked".
+    'sqlite': {
+        'dialect': 'sqlite',
+        'engine_options': {
+            'connect_args': {'timeout': 15},
+            'query_cache_size': 1200,
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 15000,
+            'mmap_size': 256 * 1024 * 1024,
+        },
+    },
+    'postgresql': {
+        'dialect': 'postgresql',
+        'engine_options': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+            'query_cache_size': 1200,
+            'connect_args': {'connect_timeout': 10, 'options': '-c statement_timeout=30000'},
+        },
+        'pragmas': {},
+    },
+}
+
+# Environment overrides for the pool settings of the chosen profile.
+POOL_OVERRIDES = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_TIMEOUT': 'pool_timeout',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+}
+
+def configure_engine_profile(app):
+    '''
+    Validates DB_ENGINE_PROFILE against the database URI and sets SQLALCHEMY_ENGINE_OPTIONS from it.
+    Must run before db.init_app(), which creates the engine.
+    '''
+    name = app.config.get('DB_ENGINE_PROFILE', 'default')
+    if name not in ENGINE_PROFILES:
+        raise RuntimeError(f"Unknown DB_ENGINE_PROFILE {name!r}, expected one of: {', '.join(ENGINE_PROFILES)}")
+    profile = ENGINE_PROFILES[name]
+
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if profile['dialect'] and url.get_backend_name() != profile['dialect']:
+        raise RuntimeError(f"DB_ENGINE_PROFILE {name!r} needs a {profile['dialect']} database, got {url.get_backend_name()}")
+    if profile['pragmas'].get('journal_mode') == 'WAL' and url.database in (None, '', ':memory:'):
+        raise RuntimeError(f"DB_ENGINE_PROFILE {name!r} needs a SQLite file; in-memory databases cannot use WAL")
+
+    options = {**profile['engine_options'], **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    if name == 'postgresql':
+        for env_name, option in POOL_OVERRIDES.items():
+            if os.getenv(env_name):
+                options[option] = int(os.getenv(env_name))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def init_engine_profile(app, engine):
+    '''
+    Applies the profile's SQLite pragmas to every new connection and checks that WAL took effect.
+    Call inside an app context once db.init_app() has created the engine.
+    '''
+    pragmas = ENGINE_PROFILES[app.config.get('DB_ENGINE_PROFILE', 'default')]['pragmas']
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    # Connections opened before the listener existed would miss the pragmas.
+    engine.dispose()
+    if 'journal_mode' in pragmas:
+        # SQLite silently keeps the old journal mode where WAL is unsupported, e.g. on network filesystems.
+        with engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        if journal_mode.lower() != pragmas['journal_mode'].lower():
+            raise RuntimeError(f"SQLite journal_mode is {journal_mode!r}, the {app.config['DB_ENGINE_PROFILE']!r} profile needs {pragmas['journal_mode']!r}")
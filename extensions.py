@@ -4,6 +4,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 from sqlalchemy.orm import DeclarativeBase
 
+from render_queue import RenderQueue
+
 class Base(DeclarativeBase):
     pass
 
@@ -11,3 +13,4 @@ login_manager = LoginManager()
 mail = Mail()
 db = SQLAlchemy(model_class=Base)
 csrf = CSRFProtect()
+render_queue = RenderQueue()
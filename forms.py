@@ -151,8 +151,8 @@ class EditEventForm(FlaskForm):
 class ShareCalendarRequestForm(FlaskForm):
     form_type = HiddenField('Form Type', default='share-calendar-request')
     image_id= HiddenField('Image ID')
-    identifier = StringField('Username or Email', validators=[DataRequired()])
-    submit = SubmitField('Send Request')
+    identifiers = TextAreaField('Usernames or Emails', validators=[DataRequired()], render_kw={"placeholder": "Separate with commas or new lines", "rows": 3})
+    submit = SubmitField('Send Requests')
 
 class ShareCalendarResponseForm(FlaskForm):
     form_type = HiddenField('Form Type', default='share-calendar-response')
@@ -1,24 +1,40 @@
+import hashlib
+import io
+import json
+import logging
+import os
 import requests
 import secrets
 import string
+import textwrap
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
+from types import SimpleNamespace
 
 from flask import current_app
-from flask_login import current_user
-from flask_mail import Message
 
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from calendar_view.calendar import Calendar
-from calendar_view.config import style
-from calendar_view.config.style import image_font
+from calendar_view.config import i18n, style
 from calendar_view.core import data
+from calendar_view.core.calendar_events import CalendarEvents
 from calendar_view.core.event import Event, EventStyle
+from calendar_view.core.round_rectangle import draw_rounded_rectangle
+from calendar_view.core.utils import FontUtils, StringUtils
 
-from PIL import ImageFont
+from PIL import Image, ImageDraw, ImageFont
 
-from extensions import db, mail
-from models import CalendarImage
+from calendar_storage import calendar_storage
+from extensions import db, render_queue
+from mail_outbox import mail_outbox
+from metrics import request_metrics, timed
+from models import CalendarEvent, CalendarImage
 
 #region --- Functions ---
 # --- Generate Six Character Code ---
@@ -27,11 +43,11 @@ def generate_secure_code(length=6):
 
     return ''.join(secrets.choice(chars) for _ in range(length))
 
-# --- Send Reset Code Via Email ---
+# --- Queue Reset Code Email ---
 def send_reset_code_email(recipient_email, code):
-    msg = Message(
+    mail_outbox.queue(
+        recipient=recipient_email,
         subject="Your Password Reset Code",
-        recipients=[recipient_email],
         body=f"""Hi,
 
 Here is your password reset code:
@@ -43,17 +59,32 @@ This code will expire in 15 minutes.
 — {current_app.config.get('APP_NAME', 'I.G.K.H.')} Team
 """
     )
-    try:
-        mail.send(msg)
-    except Exception as e:
-        current_app.logger.error(f"Email send failed: {e}")
 
 #endregion
 
 #region --- Calendar Functions ---
-def get_user_week_range(user):
-    today = datetime.now()
-    start = today - timedelta(days=today.weekday() + 1 if today.weekday != 6 else 0)
+CALENDAR_STYLE = {
+    'image_bg': (200, 200, 200, 128),
+    'hour_height': 60,
+    'font_path': 'static/fonts/LibreBaskerville-Regular.ttf',
+    'title_font_size': 80,
+    'event_title_font_size': 25,
+    'day_of_week_font_size': 32,
+}
+
+# Downscaled copies saved with every render, largest first, by width in pixels; pages pick one with srcset
+# and only the print page loads the full image.
+CALENDAR_VARIANT_WIDTHS = {
+    'medium': 1460,
+    'thumb': 640,
+}
+
+def week_start(day):
+    # Weeks run Sunday to Saturday.
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+def get_user_week_range(user, week=None):
+    start = week_start(week or date.today())
     end = start + timedelta(days=6)
     return f"{start.strftime('%Y-%m-%d')} - {end.strftime('%Y-%m-%d')}"
 
@@ -71,75 +102,81 @@ def generate_time_choices(start_hour=0, end_hour=23, step_minutes=30, end_field=
         choices.append(('23:59', '11:59 PM'))
     return choices
 
+@lru_cache(maxsize=None)
 def hex_to_rgba(hex_color, alpha):
     hex_color = hex_color.lstrip('#')
     return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4)) + (alpha,)
 
-def database_to_calendarview(data):
-    events = []
-    today = datetime.now().date()
-    start = today - timedelta(days=today.weekday() + 1 if today.weekday() != 6 else 0)
+@lru_cache(maxsize=2048)
+def time_label(value):
+    return value.strftime('%I:%M %p')
+
+def merge_busy_spans(spans):
+    # Only strictly overlapping spans are merged, so touching events stay separate like the pairwise check.
+    starts, ends = [], []
+    for start, end in sorted(spans):
+        if ends and start < ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+def overlaps_busy_span(busy, start, end):
+    starts, ends = busy
+    i = bisect_left(starts, end) - 1
+    return i >= 0 and ends[i] > start
+
+def calendarview_fields(event):
+    return dict(
+        start=event.start,
+        end=event.end,
+        title=f"{event.title}\n{time_label(event.start)} - {time_label(event.end)}",
+        notes=event.notes,
+        style=EventStyle(
+            event_border=hex_to_rgba(event.color, 240),
+            event_fill=hex_to_rgba(event.color, 192)
+        )
+    )
+
+def week_schedule_entries(data, week=None):
+    '''
+    (event, day, day_of_week) for everything shown in a week: one-time events on their day,
+    then recurring events on each of their weekdays (day is None) that no one-time event overlaps.
+    '''
+    entries = []
+    start = week_start(week or date.today())
     end = start + timedelta(days=6)
 
-    one_time_events_by_weekday = {}
+    one_time_spans_by_weekday = {}
     for event in data:
         if event.day:
 
             if not (start <= event.day <= end):
                 continue
 
-            weekday = event.day.weekday()
-            one_time_events_by_weekday.setdefault(weekday, []).append(event)
-
-            start_str = event.start.strftime('%I:%M %p')
-            end_str = event.end.strftime('%I:%M %p')
-            title_with_time = f"{event.title}\n{start_str} - {end_str}"
-
-            events.append(
-                Event(
-                    day=event.day.strftime('%Y-%m-%d'),
-                    start=event.start.strftime('%H:%M'),
-                    end=event.end.strftime('%H:%M'),
-                    title=title_with_time,
-                    notes=event.notes,
-                    style=EventStyle(
-                        event_border=hex_to_rgba(event.color, 240),
-                        event_fill=hex_to_rgba(event.color, 192)
-                    )
-                )
-            )
+            one_time_spans_by_weekday.setdefault(event.day.weekday(), []).append((event.start, event.end))
+            entries.append((event, event.day, event.day.weekday()))
+
+    # Sweep each weekday's one-time events once; recurring days then bisect into the merged spans.
+    busy_by_weekday = {weekday: merge_busy_spans(spans) for weekday, spans in one_time_spans_by_weekday.items()}
 
     for event in data:
         for recurring_day in event.recurring_days:
             weekday = recurring_day.day_of_week
 
-            overlaps = False
-            for one_time_event in one_time_events_by_weekday.get(weekday, []):
-                if event.start < one_time_event.end and event.end > one_time_event.start:
-                    overlaps = True
-                    break
-                
-            if overlaps:
+            busy = busy_by_weekday.get(weekday)
+            if busy and overlaps_busy_span(busy, event.start, event.end):
                 continue
 
-            start_str = event.start.strftime('%I:%M %p')
-            end_str = event.end.strftime('%I:%M %p')
-            title_with_time = f"{event.title}\n{start_str} - {end_str}"
-
-            events.append(
-                Event(
-                    day_of_week=weekday,
-                    start=event.start.strftime('%H:%M'),
-                    end=event.end.strftime('%H:%M'),
-                    title=title_with_time,
-                    notes=event.notes,
-                    style=EventStyle(
-                        event_border=hex_to_rgba(event.color, 240),
-                        event_fill=hex_to_rgba(event.color, 192)
-                    )
-                )
-            )
-    return events
+            entries.append((event, None, weekday))
+    return entries
+
+def database_to_calendarview(data, week=None):
+    return [
+        Event(day=day, **calendarview_fields(event)) if day else Event(day_of_week=weekday, **calendarview_fields(event))
+        for event, day, weekday in week_schedule_entries(data, week)
+    ]
 
 def generate_unique_token():
     while True:
@@ -164,6 +201,99 @@ def get_or_create_calendar_image(user_id):
     db.session.commit()
     return image
 
+def calendar_render_name(week, version):
+    return f"{week.isoformat()}.{version}.png"
+
+def calendar_variant_name(name, variant):
+    return f"{name[:-len('.png')]}.{variant}.png"
+
+def list_calendar_renders(token):
+    # Renders are named <week>.<version>.png, one or more per week while a newer one replaces the last,
+    # with their downscaled copies next to them as <week>.<version>.<variant>.png.
+    renders, variants = {}, {}
+    for stored in calendar_storage.backend.list(token):
+        if not stored.name.endswith('.png'):
+            continue
+        week, version, *variant = stored.name[:-len('.png')].split('.')
+        if variant:
+            variants.setdefault((week, version), []).append((variant[0], stored.name, stored.size))
+        else:
+            renders[week, version] = SimpleNamespace(
+                name=stored.name, week=week, version=version, size=stored.size, variants={},
+                accessed=stored.accessed, modified=stored.modified
+            )
+    for key, copies in variants.items():
+        if key in renders:
+            for variant, name, size in copies:
+                renders[key].variants[variant] = name
+                renders[key].size += size
+    return list(renders.values())
+
+def find_calendar_render(image, week, version):
+    '''
+    The exact render if it is still stored, otherwise the newest render of that week,
+    otherwise the newest render of any week. None if nothing was rendered yet.
+    '''
+    renders = list_calendar_renders(image.secure_token)
+    week = week.isoformat()
+    for render in renders:
+        if render.week == week and render.version == version:
+            return render
+    same_week = [render for render in renders if render.week == week]
+    return max(same_week or renders, key=lambda render: render.modified, default=None)
+
+def calendar_render_exists(image, week, version):
+    return calendar_storage.backend.exists(image.secure_token, calendar_render_name(week, version))
+
+def open_calendar_render(image, render, variant=None):
+    '''
+    A binary file object for render, or its variant when it has one. Renders made before variants existed only have the full image.
+    '''
+    return calendar_storage.backend.open(image.secure_token, render.variants.get(variant, render.name) if variant else render.name)
+
+def prune_calendar_cache(token, keep=()):
+    '''
+    Drops renders replaced by a newer one of the same week, then renders not viewed for CALENDAR_CACHE_MAX_AGE days,
+    then the least recently viewed until the image fits in CALENDAR_CACHE_MAX_BYTES. Render names in keep are never dropped.
+    '''
+    config = current_app.config
+    renders = sorted(list_calendar_renders(token), key=lambda render: render.modified, reverse=True)
+
+    newest, stale = {}, []
+    for render in renders:
+        if render.week in newest:
+            stale.append(render)
+        else:
+            newest[render.week] = render
+
+    cutoff = datetime.now().timestamp() - config.get('CALENDAR_CACHE_MAX_AGE', 30) * 86400
+    kept = sorted(newest.values(), key=lambda render: render.accessed)
+    stale += [render for render in kept if render.accessed < cutoff and render.name not in keep]
+    kept = [render for render in kept if render not in stale]
+
+    total = sum(render.size for render in kept)
+    for render in kept:
+        if total <= config.get('CALENDAR_CACHE_MAX_BYTES', 4 * 1024 * 1024):
+            break
+        if render.name not in keep:
+            stale.append(render)
+            total -= render.size
+
+    for render in stale:
+        if render.name in keep:
+            continue
+        # The full image goes first, so a render is never listed without its variants.
+        for name in [render.name, *render.variants.values()]:
+            calendar_storage.backend.remove(token, name)
+
+def get_calendar_events(user_id):
+    return db.session.execute(
+        select(CalendarEvent)
+        .options(selectinload(CalendarEvent.recurring_days))
+        .filter(CalendarEvent.user_id == user_id)
+        .order_by(CalendarEvent.start)
+    ).scalars().all()
+
 def update_calendar_image(user_id):
     image = db.session.execute(
         select(CalendarImage)
@@ -172,53 +302,422 @@ def update_calendar_image(user_id):
     if image:
         image.last_update = date.today()
         db.session.commit()
+        if render_queue.enabled:
+            events = database_to_calendarview(get_calendar_events(user_id))
+            render_week_schedule(image.owner, events, background=True)
 
+@lru_cache(maxsize=None)
 def image_font(size: int, font_path="static/fonts/LibreBaskerville-Regular.ttf"):
     return ImageFont.truetype(font_path, size)
 
-def render_week_schedule(user, events):
-    image = get_or_create_calendar_image(user.id)
-    path = f"static/images/calendar/{image.secure_token}.png"
-    style.image_bg = (200, 200, 200, 128)
-    style.hour_height = 60
-    style.title_font = image_font(80)
-    style.event_title_font = image_font(25)
-    style.day_of_week_font = image_font(32)
-
-    config = data.CalendarConfig(
+def week_schedule_style():
+    font_path = CALENDAR_STYLE['font_path']
+    return {
+        'image_bg': CALENDAR_STYLE['image_bg'],
+        'hour_height': CALENDAR_STYLE['hour_height'],
+        'title_font': image_font(CALENDAR_STYLE['title_font_size'], font_path),
+        'event_title_font': image_font(CALENDAR_STYLE['event_title_font_size'], font_path),
+        'day_of_week_font': image_font(CALENDAR_STYLE['day_of_week_font_size'], font_path),
+    }
+
+# calendar_view only reads its module-level style, so renders swap theirs in one at a time.
+_calendar_view_style_lock = threading.Lock()
+
+@contextmanager
+def calendar_view_style(render_style):
+    with _calendar_view_style_lock:
+        previous = {name: getattr(style, name) for name in render_style}
+        for name, value in render_style.items():
+            setattr(style, name, value)
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                setattr(style, name, value)
+
+def calendar_fingerprint(title, week_range, events):
+    digest = hashlib.sha256()
+    digest.update(repr(sorted(CALENDAR_STYLE.items())).encode())
+    digest.update(f"{title}|{week_range}".encode())
+    for event in events:
+        digest.update(repr(event).encode())
+    return digest.hexdigest()
+
+def week_schedule_config(title, week_range):
+    return data.CalendarConfig(
         lang='en',
-        title=f"{current_user.username}'s Schedule",
-        dates=get_user_week_range(current_user),
+        title=title,
+        dates=week_range,
         hours='0 - 24',
         show_date=True,
         show_year = True,
         legend=False,
         title_vertical_align='center'
     )
+
+def downscale(image, width):
+    # Area averaging: several times faster than LANCZOS on the flat-coloured render, and its copies compress smaller.
+    if image.width % width == 0:
+        return image.reduce(image.width // width)
+    return image.resize((width, round(image.height * width / image.width)), Image.BOX)
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def build_week_schedule_png(storage, token, name, title, week_range, events, engine='calendar_view'):
+    config = week_schedule_config(title, week_range)
     ''' events = [
         Event(day_of_week=0, start='08:00', end='12:30', title='First half', notes='work x 3', style=EventStyles.BLUE),
         Event(day_of_week=3, start='13:00', end='16:30', title='Another Year', notes='HBD', style=EventStyles.RED),
         Event(day='2025-10-08', start='22:00', end='23:00', title='Close to Midnight', notes='Nothing Else Matters So Close', style=EventStyle(event_border=(250, 250, 250, 240),event_fill=(200, 200, 100, 190))),
     ] '''
 
-    calendar = Calendar.build(config)
-    calendar.add_events(events)
-    calendar.save(path)
+    # Runs in the render pool, so everything it stores goes through the storage backend it was handed.
+    if engine == 'native':
+        full = build_native_week_schedule(config, events)
+        data = encode_png(full)
+    else:
+        buffer = io.BytesIO()
+        with calendar_view_style(week_schedule_style()):
+            calendar = Calendar.build(config)
+            calendar.add_events(events)
+            calendar.save(buffer)
+        data = buffer.getvalue()
+        full = calendar.full_image
+
+    # Variants are stored before the full image, whose existence marks the render as done.
+    image = full
+    for variant, width in CALENDAR_VARIANT_WIDTHS.items():
+        image = downscale(image, width)
+        storage.write(token, calendar_variant_name(name, variant), encode_png(image))
+    storage.write(token, name, data)
+
+def finish_week_render(image_id, week, fingerprint):
+    image = db.session.get(CalendarImage, image_id)
+    if not image:
+        return
+    # The stored fingerprint always names this week's render, which is the one shared with viewers.
+    if week == week_start(date.today()) and image.fingerprint != fingerprint:
+        image.fingerprint = fingerprint
+        db.session.commit()
+    keep = {calendar_render_name(week, fingerprint[:16])}
+    if image.fingerprint:
+        keep.add(calendar_render_name(week_start(date.today()), image.version))
+    prune_calendar_cache(image.secure_token, keep)
+
+@timed('render')
+def render_week_schedule(user, events, week=None, background=False):
+    '''
+    Renders the schedule for the week containing week (default: this week) unless that exact render is cached,
+    and returns (image, version) where version names the render to show.
+    '''
+    week = week_start(week or date.today())
+    image = get_or_create_calendar_image(user.id)
+    title = f"{user.username}'s Schedule"
+    week_range = get_user_week_range(user, week)
+
+    fingerprint = calendar_fingerprint(title, week_range, events)
+    version = fingerprint[:16]
+    name = calendar_render_name(week, version)
+    if calendar_storage.backend.exists(image.secure_token, name):
+        calendar_storage.backend.mark_viewed(image.secure_token, name)
+        if week == week_start(date.today()) and image.fingerprint != fingerprint:
+            image.fingerprint = fingerprint
+            db.session.commit()
+        return image, version
+
+    engine = current_app.config.get('CALENDAR_RENDER_ENGINE', 'calendar_view')
+    previous = find_calendar_render(image, week, version)
+    if previous and previous.week != week.isoformat():
+        previous = None
+
+    # Serve the week's last finished render while the pool builds the new one.
+    if render_queue.enabled and (background or previous):
+        render_queue.submit(
+            (image.id, week),
+            fingerprint,
+            build_week_schedule_png,
+            (calendar_storage.backend, image.secure_token, name, title, week_range, events, engine),
+            on_done=partial(finish_week_render, image.id, week, fingerprint)
+        )
+        return image, previous.version if previous else version
+
+    build_week_schedule_png(calendar_storage.backend, image.secure_token, name, title, week_range, events, engine)
+    finish_week_render(image.id, week, fingerprint)
+    return image, version
 
 #endregion ---
 
+#region --- Native Calendar Renderer ---
+# Draws the same image as calendar_view, but the hour grid and weekday headers are drawn
+# once per week and reused, and only the parts of the grid under events are composited again.
+NATIVE_STYLE_FIELDS = (
+    'image_bg', 'hour_height', 'day_width', 'padding_horizontal', 'padding_vertical',
+    'title_font', 'title_color', 'title_padding_left', 'title_padding_right', 'title_padding_top', 'title_padding_bottom',
+    'hour_number_font', 'hour_number_color', 'day_of_week_font', 'day_of_week_color',
+    'line_day_color', 'line_day_width', 'line_hour_color', 'line_hour_width',
+    'event_border_width', 'event_radius', 'event_title_font', 'event_title_color',
+    'event_notes_font', 'event_notes_color', 'event_padding', 'event_title_margin',
+)
+
+def native_schedule_style():
+    with _calendar_view_style_lock:
+        defaults = {name: getattr(style, name) for name in NATIVE_STYLE_FIELDS}
+    return SimpleNamespace(**(defaults | week_schedule_style()))
+
+@lru_cache(maxsize=8)
+def native_week_grid(week_range):
+    s = native_schedule_style()
+    config = week_schedule_config('', week_range)
+    date_from, date_to = config.get_date_range()
+    day_count = (date_to - date_from).days + 1
+    hour_from, hour_to = config.get_hours_range()
+    hour_count = hour_to - hour_from
+    day_height = hour_count * s.hour_height
+    size = (day_count * s.day_width + 2 * s.padding_horizontal, s.hour_height + day_height + 2 * s.padding_vertical)
+    grid = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(grid)
+
+    table_width = day_count * s.day_width
+    for i in range(1, hour_count + 2):
+        y = s.padding_vertical + i * s.hour_height
+        draw.line([(s.padding_horizontal, y), (s.padding_horizontal + table_width, y)], fill=s.line_hour_color, width=s.line_hour_width)
+
+    for i in range(day_count + 1):
+        x = s.padding_horizontal + i * s.day_width
+        y = s.padding_vertical + s.hour_height
+        draw.line([(x, y), (x, y + day_height)], fill=s.line_day_color, width=s.line_day_width)
+
+    for i in range(hour_count + 1):
+        text = str(hour_from + i)
+        text_width, text_height = FontUtils.get_text_size(s.hour_number_font, text)
+        x = s.padding_horizontal - text_width - 10
+        y = s.padding_vertical + s.hour_height + i * s.hour_height - text_height / 2
+        draw.text((x, y), text, font=s.hour_number_font, fill=s.hour_number_color)
+
+    for i in range(day_count):
+        day = date_from + timedelta(days=i)
+        text = f"{i18n.day_of_week(day.weekday(), config.lang)}, {day.strftime('%d.%m.%Y')}"
+        text_width, text_height = FontUtils.get_text_size(s.day_of_week_font, text)
+        x = s.padding_horizontal + i * s.day_width + s.day_width / 2 - text_width / 2
+        y = s.padding_vertical + text_height / 2
+        draw.text((x, y), text, font=s.day_of_week_font, fill=s.day_of_week_color)
+
+    return grid, Image.alpha_composite(Image.new("RGBA", size, s.image_bg), grid)
+
+def fit_event_text(text, box_size, font, strip_lines):
+    if not text or not text.strip() or box_size[0] <= 0 or box_size[1] <= 0:
+        return None
+
+    def visible(text, size):
+        return (text, size) if size[0] > 0 and size[1] > 0 else None
+
+    text = text.strip()
+    text_size = FontUtils.get_multiline_text_size(font, text)
+    if text_size[0] <= box_size[0]:
+        return visible(text, text_size)
+
+    max_width = StringUtils.count_max_text_width(text, strip_lines)
+    base_width = int(box_size[0] * max_width / text_size[0])
+    for retry_count in range(0, 12, 2):
+        wrap_width = base_width - retry_count
+        if wrap_width <= 0:
+            return visible(text, text_size)
+        lines = StringUtils.strip_lines(textwrap.wrap(text, width=wrap_width, replace_whitespace=False), strip_lines)
+        wrapped = '\n'.join(lines)
+        wrapped_size = FontUtils.get_multiline_text_size(font, wrapped)
+        if wrapped_size[0] <= box_size[0]:
+            return visible(wrapped, wrapped_size)
+    raise RuntimeError('Not possible to wrap the text to fit the width.')
+
+def text_y_offset(vertical_align, box_height, text_height, total_text_height):
+    if vertical_align == 'top':
+        return 0
+    if vertical_align == 'center':
+        return int(box_height / 2 - text_height / 2)
+    return max(0, box_height - total_text_height)
+
+def draw_native_event(draw, s, config, event):
+    date_from = config.get_date_range()[0]
+    hour_from = config.get_hours_range()[0]
+    day_number = (event.get_start_date(config) - date_from).days
+    x = (s.padding_horizontal + day_number * s.day_width, s.padding_horizontal + (day_number + 1) * s.day_width)
+
+    start, end = event.start_time, event.end_time
+    end_hour = 24 if (end.hour == 0 and end.minute == 0) else end.hour
+    y = (
+        s.padding_vertical + s.hour_height + (start.hour - hour_from) * s.hour_height + (start.minute / 60) * s.hour_height,
+        s.padding_vertical + s.hour_height + (end_hour - hour_from) * s.hour_height + (end.minute / 60) * s.hour_height
+    )
+
+    cascade_width = (x[1] - x[0] - s.line_day_width) / event.cascade_total
+    x1 = x[0] + s.line_day_width / 2 + (event.cascade_index - 1) * cascade_width
+    p1 = (x1, y[0])
+    p2 = (x1 + cascade_width, y[1])
+    draw_rounded_rectangle(draw, [p1, p2], s.event_radius, outline=event.style.event_border,
+                           fill=event.style.event_fill, width=s.event_border_width)
+
+    cell_size = (
+        max(0, int(x[1] - x[0] - 2 * s.line_day_width) - 2 * s.event_padding),
+        max(0, int(y[1] - y[0] - 2 * s.line_day_width) - 2 * s.event_padding)
+    )
+    if cell_size[0] == 0 or cell_size[1] == 0:
+        return
+
+    title = fit_event_text(event.title, cell_size, s.event_title_font, True)
+    notes_size = (cell_size[0], cell_size[1] - (title[1][1] + s.event_title_margin if title else 0))
+    notes = fit_event_text(event.notes, notes_size, s.event_notes_font, False)
+    total_height = (title[1][1] if title else 0) + (notes[1][1] if notes else 0)
+
+    y_top = y[0] + s.event_padding
+    if title:
+        offset = text_y_offset(config.title_vertical_align, cell_size[1], title[1][1], total_height)
+        title_pos = ((p1[0] + p2[0]) / 2 - title[1][0] / 2, y_top + offset)
+        draw.multiline_text(title_pos, title[0], align='center', font=s.event_title_font, fill=s.event_title_color)
+        y_top = title_pos[1] + title[1][1] + s.event_title_margin
+
+    if notes:
+        offset = 0 if title else text_y_offset(config.title_vertical_align, cell_size[1], notes[1][1], total_height)
+        notes_pos = (p1[0] + s.event_padding, y_top + offset)
+        draw.multiline_text(notes_pos, notes[0], align='left', font=s.event_notes_font, fill=s.event_notes_color)
+
+def build_native_week_schedule(config, events):
+    s = native_schedule_style()
+    grid, base = native_week_grid(config.dates)
+
+    # calendar_view's own bookkeeping decides which events show and how overlaps cascade.
+    layout = CalendarEvents(config)
+    for event in events:
+        layout.add_event(event)
+    layout.group_cascade_events()
+
+    event_layer = Image.new("RGBA", grid.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(event_layer)
+    for event in layout.events:
+        draw_native_event(draw, s, config, event)
+
+    schedule_width, schedule_height = grid.size
+    title_size = FontUtils.get_multiline_text_size(s.title_font, config.title)
+    title_width = title_size[0] + s.title_padding_left + s.title_padding_right
+    title_height = title_size[1] + s.title_padding_top + s.title_padding_bottom
+    final_width = max(schedule_width, title_width)
+
+    title_band = Image.new("RGBA", (final_width, title_height), (0, 0, 0, 0))
+    title_left = max(s.title_padding_left, (final_width - title_size[0]) / 2)
+    ImageDraw.Draw(title_band).multiline_text((title_left, s.title_padding_top), config.title, align='center',
+                                              font=s.title_font, fill=s.title_color)
+
+    full_image = Image.new("RGBA", (final_width, schedule_height + title_height), s.image_bg)
+    full_image.paste(Image.alpha_composite(Image.new("RGBA", title_band.size, s.image_bg), title_band), (0, 0))
+    schedule_left = int((final_width - schedule_width) / 2)
+    full_image.paste(base, (schedule_left, title_height))
+
+    # Outside the events the grid is unchanged, so only composite the covered area of each day.
+    day_count = (schedule_width - 2 * s.padding_horizontal) // s.day_width
+    for i in range(day_count):
+        left = 0 if i == 0 else s.padding_horizontal + i * s.day_width
+        right = schedule_width if i == day_count - 1 else s.padding_horizontal + (i + 1) * s.day_width
+        box = event_layer.crop((left, 0, right, schedule_height)).getbbox()
+        if not box:
+            continue
+        box = (box[0] + left, box[1], box[2] + left, box[3])
+        events = Image.alpha_composite(grid.crop(box), event_layer.crop(box))
+        events = Image.alpha_composite(Image.new("RGBA", events.size, s.image_bg), events)
+        full_image.paste(events, (schedule_left + box[0], title_height + box[1]))
+
+    return full_image
+
+#endregion
+
 #region --- APIs ---
+QUOTE_FALLBACKS = [
+    {'text': 'The secret of getting ahead is getting started.', 'author': 'Mark Twain'},
+    {'text': 'Well done is better than well said.', 'author': 'Benjamin Franklin'},
+    {'text': 'It always seems impossible until it is done.', 'author': 'Nelson Mandela'},
+    {'text': 'Action is the foundational key to all success.', 'author': 'Pablo Picasso'},
+    {'text': 'Lost time is never found again.', 'author': 'Benjamin Franklin'},
+    {'text': 'Do what you can, with what you have, where you are.', 'author': 'Theodore Roosevelt'},
+    {'text': 'Nothing will work unless you do.', 'author': 'Maya Angelou'},
+]
+QUOTE_RETRY_AFTER = timedelta(minutes=15)
+
+# The quote is fetched on its own thread without an app context, so current_app.logger is out of reach.
+logger = logging.getLogger(__name__)
+
+# One quote per process, shared with the other workers through QUOTE_CACHE_PATH.
+_quote_lock = threading.Lock()
+_quote_cache = {'date': None, 'quote': None, 'retry_at': None, 'refreshing': False}
 
 def inspire():
     url = "https://zenquotes.io/api/today"
-    print("Quote retrieval successful.")
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=5)
         response.raise_for_status()
         inspiration = response.json()
-        return inspiration
+        logger.info("Quote retrieval successful.")
+        return {'text': inspiration[0]['q'], 'author': inspiration[0]['a']}
     except requests.RequestException as e:
-        print(f"Request error: {e}")
-    except (KeyError, ValueError) as e:
-        print(f"Data parsing error: {e}")
-    return None
\ No newline at end of file
+        logger.warning(f"Quote request error: {e}")
+    except (IndexError, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Quote data parsing error: {e}")
+    return None
+
+def fallback_quote(day):
+    return QUOTE_FALLBACKS[date.fromisoformat(day).toordinal() % len(QUOTE_FALLBACKS)]
+
+def read_quote_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_quote_file(path, day, quote):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'date': day, 'quote': quote}, f)
+    os.replace(tmp_path, path)
+
+def refresh_daily_quote(path, day):
+    # Runs on its own thread, outside any request, so the fetch gets a histogram of its own.
+    started = time.perf_counter()
+    quote = inspire()
+    request_metrics.observe('igkh_quote_fetch_seconds', 'background', time.perf_counter() - started)
+    with _quote_lock:
+        if quote:
+            _quote_cache.update(date=day, quote=quote, retry_at=None)
+        else:
+            if _quote_cache['date'] != day:
+                _quote_cache.update(date=day, quote=fallback_quote(day))
+            _quote_cache['retry_at'] = datetime.now() + QUOTE_RETRY_AFTER
+        _quote_cache['refreshing'] = False
+    if quote:
+        try:
+            write_quote_file(path, day, quote)
+        except OSError as e:
+            logger.warning(f"Quote cache write error: {e}")
+
+def get_daily_quote():
+    day = date.today().isoformat()
+    path = current_app.config['QUOTE_CACHE_PATH']
+
+    with _quote_lock:
+        retry_at = _quote_cache['retry_at']
+        if _quote_cache['date'] == day and (retry_at is None or datetime.now() < retry_at):
+            return _quote_cache['quote']
+
+        if not _quote_cache['refreshing']:
+            shared = read_quote_file(path)
+            if shared and shared.get('date') == day:
+                _quote_cache.update(date=day, quote=shared['quote'], retry_at=None)
+                return shared['quote']
+
+            # Keep serving what we have while today's quote is fetched off the request path.
+            _quote_cache['refreshing'] = True
+            threading.Thread(target=refresh_daily_quote, args=(path, day), daemon=True).start()
+            if _quote_cache['quote'] is None:
+                _quote_cache['quote'] = shared['quote'] if shared else fallback_quote(day)
+
+        return _quote_cache['quote']
@@ -0,0 +1,143 @@
+import threading
+
+from datetime import datetime, timedelta
+
+import click
+from flask_mail import Message
+from sqlalchemy import delete, or_, select, update
+
+from extensions import db, mail
+from models import OutboxEmail
+
+class MailOutbox:
+    '''
+    Sends queued OutboxEmail rows in batches over a single SMTP connection.
+    Rows are leased before sending so several workers can drain the same table,
+    and failed rows are retried with exponential backoff until MAIL_OUTBOX_MAX_ATTEMPTS.
+    Sent rows are deleted MAIL_OUTBOX_RETENTION_DAYS after sending.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._purged = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MAIL_OUTBOX_INTERVAL', 5)
+        app.config.setdefault('MAIL_OUTBOX_BATCH_SIZE', 20)
+        app.config.setdefault('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        app.config.setdefault('MAIL_OUTBOX_BACKOFF', 30)
+        app.config.setdefault('MAIL_OUTBOX_LEASE', 120)
+        app.config.setdefault('MAIL_OUTBOX_RETENTION_DAYS', 7)
+        # Started on the first request so it lives in the serving process, not a pre-fork parent.
+        app.before_request(self.start)
+        app.cli.command('send-outbox')(self._send_outbox_command)
+
+    def queue(self, recipient, subject, body):
+        email = OutboxEmail(recipient=recipient, subject=subject, body=body)
+        db.session.add(email)
+        return email
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread or not self.app.config['MAIL_OUTBOX_INTERVAL']:
+            return
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def drain(self):
+        config = self.app.config
+        now = datetime.now()
+        available = or_(OutboxEmail.locked_until.is_(None), OutboxEmail.locked_until < now)
+
+        due = db.session.execute(
+            select(OutboxEmail.id)
+            .filter(OutboxEmail.sent.is_(None), OutboxEmail.next_attempt <= now, available)
+            .order_by(OutboxEmail.id)
+            .limit(config['MAIL_OUTBOX_BATCH_SIZE'])
+        ).scalars().all()
+
+        claimed = []
+        for email_id in due:
+            result = db.session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == email_id, available)
+                .values(locked_until=now + timedelta(seconds=config['MAIL_OUTBOX_LEASE']))
+            )
+            if result.rowcount:
+                claimed.append(email_id)
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        emails = db.session.execute(select(OutboxEmail).filter(OutboxEmail.id.in_(claimed))).scalars().all()
+        try:
+            with mail.connect() as connection:
+                for email in emails:
+                    try:
+                        connection.send(Message(subject=email.subject, recipients=[email.recipient], body=email.body))
+                        email.sent = datetime.now()
+                    except Exception as e:
+                        self._retry_later(email, e)
+        except Exception as e:
+            for email in emails:
+                if not email.sent:
+                    self._retry_later(email, e)
+
+        for email in emails:
+            email.locked_until = None
+        db.session.commit()
+        return len(emails)
+
+    def purge(self):
+        '''
+        Deletes emails sent more than MAIL_OUTBOX_RETENTION_DAYS ago. Returns how many.
+        '''
+        cutoff = datetime.now() - timedelta(days=self.app.config['MAIL_OUTBOX_RETENTION_DAYS'])
+        result = db.session.execute(delete(OutboxEmail).where(OutboxEmail.sent < cutoff))
+        db.session.commit()
+        return result.rowcount
+
+    def _retry_later(self, email, error):
+        config = self.app.config
+        email.attempts += 1
+        email.last_error = str(error)[:256]
+        if email.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+            email.next_attempt = None
+            self.app.logger.error(f"Giving up on email {email.id} to {email.recipient}: {error}")
+        else:
+            email.next_attempt = datetime.now() + timedelta(seconds=config['MAIL_OUTBOX_BACKOFF'] * 2 ** (email.attempts - 1))
+            self.app.logger.warning(f"Email {email.id} send failed, retry {email.attempts}: {error}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.app.config['MAIL_OUTBOX_INTERVAL'])
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    while self.drain():
+                        pass
+                    # Sent rows only expire by the day, so an hourly purge is plenty.
+                    if not self._purged or datetime.now() - self._purged > timedelta(hours=1):
+                        self.purge()
+                        self._purged = datetime.now()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Mail outbox error: {e}")
+
+    def _send_outbox_command(self):
+        '''Send every due email in the outbox and delete old sent ones.'''
+        sent = 0
+        while batch := self.drain():
+            sent += batch
+        click.echo(f"Processed {sent} email(s), deleted {self.purge()} sent more than {self.app.config['MAIL_OUTBOX_RETENTION_DAYS']} day(s) ago.")
+
+mail_outbox = MailOutbox()
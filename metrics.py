@@ -0,0 +1,144 @@
+import threading
+import time
+
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Response, abort, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Time spent in each section of a request, recorded next to the total wall time.
+SECTIONS = ('sql', 'template', 'render')
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.total}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+def timed(section):
+    '''
+    Adds the wrapped call's duration to the current request's section total.
+    Calls outside a request (CLI commands, background threads) are not recorded.
+    '''
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if has_request_context() and 'request_metrics' in g:
+                    g.request_metrics[section] += time.perf_counter() - start
+        return wrapper
+    return decorator
+
+class RequestMetrics:
+    '''
+    Per-endpoint histograms of wall time, SQL time and query count, template time and
+    calendar render time, served in Prometheus text format at /metrics. Work done outside a request
+    (the daily quote fetch) is recorded with observe under the endpoint label "background".
+    Histograms live in process memory, so each worker process exports its own.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._histograms = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', 0)
+        app.config.setdefault('METRICS_ALLOWED_ADDRS', ('127.0.0.1', '::1'))
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._finish_template, app)
+        if not event.contains(Engine, 'before_cursor_execute', _start_query):
+            event.listen(Engine, 'before_cursor_execute', _start_query)
+            event.listen(Engine, 'after_cursor_execute', _finish_query)
+
+    def observe(self, name, endpoint, value, buckets=SECONDS_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get((name, endpoint))
+            if histogram is None:
+                histogram = self._histograms[(name, endpoint)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def export(self):
+        if request.remote_addr not in self.app.config['METRICS_ALLOWED_ADDRS']:
+            abort(404)
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, endpoint in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (histogram_name, endpoint), histogram in sorted(self._histograms.items()):
+                    if histogram_name == name:
+                        lines += histogram.lines(name, f'endpoint="{endpoint}"')
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    def _start_request(self):
+        g.request_metrics = dict.fromkeys(SECTIONS, 0.0)
+        g.request_metrics.update(queries=0, started=time.perf_counter(), templates=[])
+
+    def _finish_request(self, error=None):
+        stats = g.pop('request_metrics', None)
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats['started']
+        endpoint = request.endpoint or 'unmatched'
+
+        self.observe('igkh_request_seconds', endpoint, elapsed)
+        self.observe('igkh_sql_queries', endpoint, stats['queries'], QUERY_BUCKETS)
+        for section in SECTIONS:
+            self.observe(f"igkh_{section}_seconds", endpoint, stats[section])
+
+        slow_ms = self.app.config['METRICS_SLOW_REQUEST_MS']
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            breakdown = ', '.join(f"{section} {stats[section] * 1000:.0f} ms" for section in SECTIONS)
+            self.app.logger.warning(
+                f"Slow request {request.method} {request.path} took {elapsed * 1000:.0f} ms "
+                f"({stats['queries']} queries, {breakdown})"
+            )
+
+    def _start_template(self, sender, template, context, **extra):
+        if 'request_metrics' in g:
+            g.request_metrics['templates'].append(time.perf_counter())
+
+    def _finish_template(self, sender, template, context, **extra):
+        # Only the outermost render counts, in case a view renders a template inside another.
+        if 'request_metrics' in g and g.request_metrics['templates']:
+            started = g.request_metrics['templates'].pop()
+            if not g.request_metrics['templates']:
+                g.request_metrics['template'] += time.perf_counter() - started
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics['sql'] += time.perf_counter() - conn.info['query_started']
+        g.request_metrics['queries'] += 1
+
+request_metrics = RequestMetrics()
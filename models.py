@@ -2,9 +2,8 @@ import enum
 
 from datetime import date, datetime, time
 from typing import List
-from werkzeug.security import check_password_hash
 from flask_login import UserMixin
-from sqlalchemy import CheckConstraint, Date, DateTime, ForeignKey, Integer, String, Time, UniqueConstraint
+from sqlalchemy import CheckConstraint, Date, DateTime, ForeignKey, Index, Integer, String, Text, Time, UniqueConstraint, func
 from sqlalchemy import JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -25,12 +24,12 @@ class User(db.Model, UserMixin):
     previous_passwords: Mapped[List['PreviousPassword']] = relationship(back_populates='user', cascade='all, delete-orphan')
     calendar_events = relationship('CalendarEvent', back_populates='user', cascade='all, delete-orphan')
 
-    def has_used_password(self, raw_password: str, limit: int = 5) -> bool:
-        recent = sorted(self.previous_passwords, key=lambda p: p.change_date, reverse=True)[:limit]
-        return any(check_password_hash(p.previous_password, raw_password) for p in recent)
-
     def __repr__(self):
         return f'<User {self.username}>'
+
+# Case-insensitive lookups in login, forgot_password and the username validators.
+Index('ix_users_lower_username', func.lower(User.username))
+Index('ix_users_lower_email', func.lower(User.email))
     
 class UserTheme(db.Model):
     __tablename__ = 'user_theme'
@@ -43,10 +42,13 @@ class UserTheme(db.Model):
 
 class ResetCode(db.Model):
     __tablename__ = 'reset_codes'
+    __table_args__ = (
+        Index('ix_reset_codes_user_requested', 'user_id', 'requested'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
-    code: Mapped[str] = mapped_column(String(6), nullable=False)
+    code: Mapped[str] = mapped_column(String(6), nullable=False, index=True)
     requested: Mapped[datetime] = mapped_column(DateTime(), default=lambda: datetime.now())
     expiration: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
     used: Mapped[bool] = mapped_column(default=False)
@@ -55,8 +57,28 @@ class ResetCode(db.Model):
     def is_expired(self) -> bool:
         return datetime.now() > self.expiration
 
+class OutboxEmail(db.Model):
+    __tablename__ = 'outbox_emails'
+    __table_args__ = (
+        Index('ix_outbox_emails_due', 'sent', 'next_attempt'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str] = mapped_column(String(256), nullable=False)
+    subject: Mapped[str] = mapped_column(String(128), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    created: Mapped[datetime] = mapped_column(DateTime(), default=lambda: datetime.now())
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt: Mapped[datetime] = mapped_column(DateTime(), nullable=True, default=lambda: datetime.now())
+    locked_until: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    sent: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    last_error: Mapped[str] = mapped_column(String(256), nullable=True)
+
 class PreviousPassword(db.Model):
     __tablename__ = 'previous_passwords'
+    __table_args__ = (
+        Index('ix_previous_passwords_user_changed', 'user_id', 'change_date'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
@@ -66,6 +88,10 @@ class PreviousPassword(db.Model):
 
 class CalendarEvent(db.Model):
     __tablename__ = 'calendar_events'
+    __table_args__ = (
+        Index('ix_calendar_events_user_day', 'user_id', 'day'),
+        Index('ix_calendar_events_user_start', 'user_id', 'start'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
@@ -78,6 +104,7 @@ class CalendarEvent(db.Model):
 
     user = relationship('User', back_populates='calendar_events')
     recurring_days = relationship('CalendarEventDay', back_populates='event', cascade='all, delete-orphan')
+    occurrences = relationship('CalendarOccurrence', back_populates='event', cascade='all, delete-orphan')
 
 class CalendarEventDay(db.Model):
     __tablename__ = 'calendar_event_days'
@@ -92,17 +119,50 @@ class CalendarEventDay(db.Model):
 
     event = relationship('CalendarEvent', back_populates='recurring_days')
 
+class CalendarOccurrence(db.Model):
+    '''
+    One row per date an event happens on. One-time events always have their row;
+    recurring events have rows for the dates inside the owner's OccurrenceWindow.
+    '''
+    __tablename__ = 'calendar_occurrences'
+    __table_args__ = (
+        Index('ix_calendar_occurrences_user_date_start', 'user_id', 'date', 'start'),
+        UniqueConstraint('event_id', 'date', name='unique_event_date'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    event_id: Mapped[int] = mapped_column(ForeignKey('calendar_events.id'), nullable=False)
+    date: Mapped[date] = mapped_column(Date(), nullable=False)
+    start: Mapped[time] = mapped_column(Time(), nullable=False)
+    end: Mapped[time] = mapped_column(Time(), nullable=False)
+
+    event = relationship('CalendarEvent', back_populates='occurrences')
+
+class OccurrenceWindow(db.Model):
+    __tablename__ = 'occurrence_windows'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    start: Mapped[date] = mapped_column(Date(), nullable=False)
+    end: Mapped[date] = mapped_column(Date(), nullable=False)
+
 class CalendarImage(db.Model):
     __tablename__ = 'calendar_images'
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    owner_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    owner_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False, index=True)
     secure_token: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
     last_update: Mapped[date] = mapped_column(Date, nullable=False, default=date.today)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=True)
 
     owner = relationship('User', backref='calendar_images')
     viewers = relationship('CalendarShare', back_populates='image')
 
+    @property
+    def version(self):
+        # Changes whenever the rendered image does, so image URLs can be cached for good.
+        return self.fingerprint[:16] if self.fingerprint else 'latest'
+
 class CalendarShareStatus(enum.IntEnum):
     DECLINED = 0
     PENDING = 1
@@ -117,6 +177,10 @@ class CalendarShareStatus(enum.IntEnum):
 
 class CalendarShare(db.Model):
     __tablename__ = 'calendar_shares'
+    __table_args__ = (
+        Index('ix_calendar_shares_viewer_status', 'viewer_id', 'status'),
+        Index('ix_calendar_shares_image_viewer', 'image_id', 'viewer_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     image_id: Mapped[int] = mapped_column(ForeignKey('calendar_images.id'), nullable=False)
@@ -133,3 +197,7 @@ class NotepadData(db.Model):
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False, unique=True)
     title: Mapped[str] = mapped_column(String(32), nullable=False, default='Title')
     body: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Bumped on every write; an UPDATE made against an older version raises StaleDataError.
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
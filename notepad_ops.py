@@ -0,0 +1,88 @@
+import secrets
+
+MAX_ITEMS = 500
+MAX_TEXT_LENGTH = 256
+MAX_TITLE_LENGTH = 32
+
+class NoteOpError(ValueError):
+    pass
+
+def new_item_id():
+    return secrets.token_hex(4)
+
+def with_item_ids(body):
+    '''
+    Items saved before they had ids get one, so operations can address them. Returns None if nothing changed.
+    '''
+    if all('id' in item for item in body):
+        return None
+    return [item if 'id' in item else dict(item, id=new_item_id()) for item in body]
+
+def apply_note_ops(title, body, ops):
+    '''
+    Applies item operations to a copy of the note and returns (title, body).
+    Operations address items by id and are idempotent, so a client can replay them on top of a newer version:
+    inserting an id that exists, or changing one that is gone, does nothing.
+
+        {"op": "insert", "id": "a1b2c3d4", "after": "<id>" | null, "text": "", "checked": false}
+        {"op": "update", "id": "...", "text": "..."}
+        {"op": "toggle", "id": "...", "checked": true}
+        {"op": "delete", "id": "..."}
+        {"op": "reorder", "ids": ["...", "..."]}
+        {"op": "title", "title": "..."}
+    '''
+    if not isinstance(ops, list):
+        raise NoteOpError("ops must be a list")
+
+    items = [dict(item) for item in body]
+    for op in ops:
+        if not isinstance(op, dict):
+            raise NoteOpError("Each op must be an object")
+        kind = op.get('op')
+        index = {item['id']: i for i, item in enumerate(items)}
+
+        if kind == 'title':
+            title = text_field(op, 'title', MAX_TITLE_LENGTH)
+        elif kind == 'insert':
+            item_id = id_field(op, 'id')
+            if item_id in index:
+                continue
+            if len(items) >= MAX_ITEMS:
+                raise NoteOpError(f"A note holds at most {MAX_ITEMS} items")
+            after = op.get('after')
+            position = index[after] + 1 if after in index else (len(items) if after else 0)
+            items.insert(position, {'id': item_id, 'text': text_field(op, 'text', MAX_TEXT_LENGTH), 'checked': bool(op.get('checked', False))})
+        elif kind == 'update':
+            item_id = id_field(op, 'id')
+            if item_id in index:
+                items[index[item_id]]['text'] = text_field(op, 'text', MAX_TEXT_LENGTH)
+        elif kind == 'toggle':
+            item_id = id_field(op, 'id')
+            if item_id in index:
+                items[index[item_id]]['checked'] = bool(op.get('checked'))
+        elif kind == 'delete':
+            item_id = id_field(op, 'id')
+            if item_id in index:
+                del items[index[item_id]]
+        elif kind == 'reorder':
+            ids = op.get('ids')
+            if not isinstance(ids, list):
+                raise NoteOpError("reorder needs a list of ids")
+            # Listed items first in the given order; anything not listed keeps its place after them.
+            rank = {item_id: i for i, item_id in enumerate(ids) if item_id in index}
+            items.sort(key=lambda item: rank.get(item['id'], len(rank)))
+        else:
+            raise NoteOpError(f"Unknown op {kind!r}")
+    return title, items
+
+def id_field(op, name):
+    value = op.get(name)
+    if not isinstance(value, str) or not 0 < len(value) <= 32:
+        raise NoteOpError(f"{op.get('op')} needs a string {name}")
+    return value
+
+def text_field(op, name, max_length):
+    value = op.get(name, '')
+    if not isinstance(value, str):
+        raise NoteOpError(f"{name} must be a string")
+    return value[:max_length]
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from helpers import week_start
+from models import CalendarEvent, CalendarOccurrence, OccurrenceWindow
+
+def occurrence_window(today=None):
+    # From the start of last week to OCCURRENCE_WINDOW_DAYS past the start of this one.
+    this_week = week_start(today or date.today())
+    return this_week - timedelta(days=7), this_week + timedelta(days=current_app.config.get('OCCURRENCE_WINDOW_DAYS', 56) - 1)
+
+def event_occurrences(event, start, end):
+    row = dict(user_id=event.user_id, event_id=event.id, start=event.start, end=event.end)
+    if event.day:
+        return [dict(row, date=event.day)]
+    weekdays = {recurring_day.day_of_week for recurring_day in event.recurring_days}
+    return [
+        dict(row, date=start + timedelta(days=offset))
+        for offset in range((end - start).days + 1)
+        if (start + timedelta(days=offset)).weekday() in weekdays
+    ]
+
+def add_event_occurrences(event):
+    '''
+    Inserts the occurrences of a new, flushed event inside its owner's window. Commit is left to the caller.
+    '''
+    window = db.session.get(OccurrenceWindow, event.user_id)
+    if not window:
+        # Built with everything else the first time the window is needed.
+        return
+    rows = event_occurrences(event, window.start, window.end)
+    if rows:
+        db.session.execute(insert(CalendarOccurrence), rows)
+
+def ensure_occurrence_window(user_id):
+    '''
+    Rebuilds the user's occurrences when the window has moved on since they were last built,
+    which happens once a week per active user.
+    '''
+    start, end = occurrence_window()
+    window = db.session.get(OccurrenceWindow, user_id)
+    if window and window.start == start and window.end == end:
+        return
+
+    events = db.session.execute(
+        select(CalendarEvent)
+        .options(selectinload(CalendarEvent.recurring_days))
+        .filter(CalendarEvent.user_id == user_id)
+    ).scalars().all()
+    rows = [row for event in events for row in event_occurrences(event, start, end)]
+
+    db.session.execute(delete(CalendarOccurrence).where(CalendarOccurrence.user_id == user_id))
+    if rows:
+        db.session.execute(insert(CalendarOccurrence), rows)
+    if window:
+        window.start, window.end = start, end
+    else:
+        db.session.add(OccurrenceWindow(user_id=user_id, start=start, end=end))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request built the same window first.
+        db.session.rollback()
+
+def get_events_between(user_id, start, end):
+    '''
+    (date, event) for every occurrence from start to end inclusive, ordered by date and start time.
+    The range must lie inside the current occurrence window.
+    '''
+    ensure_occurrence_window(user_id)
+    return db.session.execute(
+        select(CalendarOccurrence.date, CalendarEvent)
+        .join(CalendarOccurrence.event)
+        .filter(
+            CalendarOccurrence.user_id == user_id,
+            CalendarOccurrence.date.between(start, end)
+        )
+        .order_by(CalendarOccurrence.date, CalendarOccurrence.start)
+    ).all()
+
+def get_events_on(user_id, day):
+    return [event for _, event in get_events_between(user_id, day, day)]
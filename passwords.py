@@ -0,0 +1,111 @@
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from extensions import db
+from models import PreviousPassword
+
+class PasswordService:
+    '''
+    Hashes and checks passwords with PASSWORD_HASH_METHOD.
+    Reuse checks run the key derivations in a thread pool (hashlib releases the GIL while deriving),
+    and hashes made with an older method or cost are replaced on the next successful login.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self.method = None
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HISTORY', 5)
+        app.config.setdefault('PASSWORD_CHECK_WORKERS', 4)
+        # werkzeug fills in default parameters, so 'pbkdf2' is stored as e.g. 'pbkdf2:sha256:1000000'.
+        self.method = generate_password_hash('', app.config['PASSWORD_HASH_METHOD']).split('$', 1)[0]
+
+    @property
+    def executor(self):
+        # Created on first use so the threads live in the serving process, not a pre-fork parent.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.app.config['PASSWORD_CHECK_WORKERS'],
+                        thread_name_prefix='password-check'
+                    )
+        return self._executor
+
+    def hash(self, password):
+        return generate_password_hash(password, self.method)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def login(self, user, password):
+        '''
+        Checks the password and, when it matches a hash made with an outdated method, rehashes it.
+        The caller commits.
+        '''
+        if not check_password_hash(user.password, password):
+            return False
+        if self.needs_rehash(user.password):
+            user.password = self.hash(password)
+        return True
+
+    def matches_any(self, hashes, password):
+        if len(hashes) < 2:
+            return any(check_password_hash(h, password) for h in hashes)
+
+        pending = {self.executor.submit(check_password_hash, h, password) for h in hashes}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(future.result() for future in done):
+                for future in pending:
+                    future.cancel()
+                return True
+        return False
+
+    def recent_hashes(self, user_id):
+        return db.session.execute(
+            select(PreviousPassword.previous_password)
+            .filter(PreviousPassword.user_id == user_id)
+            .order_by(PreviousPassword.change_date.desc(), PreviousPassword.id.desc())
+            .limit(self.app.config['PASSWORD_HISTORY'])
+        ).scalars().all()
+
+    def is_reused(self, user, password):
+        '''
+        True if password is the current one or one of the last PASSWORD_HISTORY passwords.
+        '''
+        return self.matches_any([user.password, *self.recent_hashes(user.id)], password)
+
+    def change(self, user, password):
+        '''
+        Moves the current hash into the history, sets the new password and drops history past PASSWORD_HISTORY.
+        The caller commits.
+        '''
+        db.session.add(PreviousPassword(user_id=user.id, previous_password=user.password, change_date=datetime.now()))
+        user.password = self.hash(password)
+        db.session.flush()
+
+        keep = (
+            select(PreviousPassword.id)
+            .filter(PreviousPassword.user_id == user.id)
+            .order_by(PreviousPassword.change_date.desc(), PreviousPassword.id.desc())
+            .limit(self.app.config['PASSWORD_HISTORY'])
+        )
+        db.session.execute(
+            delete(PreviousPassword)
+            .where(PreviousPassword.user_id == user.id, PreviousPassword.id.not_in(keep))
+            .execution_options(synchronize_session=False)
+        )
+
+passwords = PasswordService()
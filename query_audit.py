@@ -0,0 +1,121 @@
+from datetime import date, datetime
+
+import click
+from sqlalchemy import delete, inspect, or_, select, func, union_all
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import CalendarEvent, CalendarEventDay, CalendarImage, CalendarOccurrence, CalendarShare, CalendarShareStatus, NotepadData, OccurrenceWindow, OutboxEmail, PreviousPassword, ResetCode, User
+
+# One entry per query shape the app issues, with placeholder values.
+QUERY_PATTERNS = {
+    'login': lambda: select(User).where(or_(User.username == 'someone', func.lower(User.email) == 'someone@example.com')),
+    'email_lookup': lambda: select(User).where(func.lower(User.email) == 'someone@example.com'),
+    'validate_username': lambda: select(User).where(func.lower(User.username) == 'someone'),
+    'recent_reset_code': lambda: select(ResetCode).where(
+        ResetCode.user_id == 1,
+        ResetCode.requested > datetime(2000, 1, 1),
+        ResetCode.used.is_(False)
+    ),
+    'verify_reset_code': lambda: select(ResetCode).where(ResetCode.code == 'ABC123'),
+    'previous_passwords': lambda: select(PreviousPassword.previous_password).where(PreviousPassword.user_id == 1).order_by(PreviousPassword.change_date.desc()).limit(5),
+    'notepad': lambda: select(NotepadData).filter(NotepadData.user_id == 1),
+    'dashboard_events': lambda: select(CalendarOccurrence.date, CalendarEvent).join(CalendarOccurrence.event).filter(
+        CalendarOccurrence.user_id == 1,
+        CalendarOccurrence.date.between(date(2000, 1, 1), date(2000, 1, 1))
+    ).order_by(CalendarOccurrence.date, CalendarOccurrence.start),
+    'occurrence_window': lambda: select(OccurrenceWindow).filter(OccurrenceWindow.user_id == 1),
+    'pending_share': lambda: select(CalendarShare).filter(
+        CalendarShare.viewer_id == 1,
+        CalendarShare.status == CalendarShareStatus.PENDING
+    ),
+    # The week page, the week API and the in-memory conflict index are all built from these two.
+    'week_events': lambda: select(CalendarEvent).filter(CalendarEvent.user_id == 1).order_by(CalendarEvent.start),
+    'week_event_days': lambda: select(CalendarEventDay).filter(CalendarEventDay.event_id.in_([1, 2, 3])),
+    'occurrence_rebuild_events': lambda: select(CalendarEvent).filter(CalendarEvent.user_id == 1),
+    'occurrence_rebuild_delete': lambda: delete(CalendarOccurrence).where(CalendarOccurrence.user_id == 1),
+    'event_occurrences': lambda: select(CalendarOccurrence).filter(CalendarOccurrence.event_id == 1),
+    'event_days': lambda: select(CalendarEventDay).filter(CalendarEventDay.event_id == 1),
+    'calendar_image_by_owner': lambda: select(CalendarImage).filter(CalendarImage.owner_id == 1),
+    'calendar_image_by_token': lambda: select(CalendarImage).filter_by(secure_token='token'),
+    'share_recipients': lambda: select(User.id, User.username, User.email).filter(or_(
+        func.lower(User.username).in_(['someone', 'someone@example.com']),
+        func.lower(User.email).in_(['someone', 'someone@example.com'])
+    )),
+    'existing_shares': lambda: select(CalendarShare.viewer_id, CalendarShare.status).filter(
+        CalendarShare.image_id == 1, CalendarShare.viewer_id.in_([1, 2])
+    ),
+    'share_lists': lambda: select(CalendarShare).join(CalendarShare.image).filter(CalendarShare.id.in_(union_all(
+        select(CalendarShare.id).filter(
+            CalendarShare.viewer_id == 1,
+            CalendarShare.status.in_([CalendarShareStatus.ACCEPTED, CalendarShareStatus.PENDING])
+        ),
+        select(CalendarShare.id).join(CalendarShare.image).filter(CalendarImage.owner_id == 1)
+    ))).order_by(CalendarImage.last_update.desc()),
+    'outbox_due': lambda: select(OutboxEmail.id).filter(
+        OutboxEmail.sent.is_(None),
+        OutboxEmail.next_attempt <= datetime(2000, 1, 1)
+    ).order_by(OutboxEmail.id),
+    'outbox_purge': lambda: delete(OutboxEmail).where(OutboxEmail.sent < datetime(2000, 1, 1)),
+}
+
+def explain(connection, stmt):
+    sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {sql}")]
+
+def is_full_scan(line):
+    line = line.strip()
+    # SQLite: "SCAN users" (a "SCAN ... USING INDEX" walks an index instead). PostgreSQL: "Seq Scan on users".
+    return (line.startswith('SCAN ') and ' USING ' not in line) or 'Seq Scan' in line
+
+def index_names(connection, inspector, table_name):
+    # SQLite reflection skips expression indexes such as lower(email), so read the catalog directly.
+    if connection.dialect.name == 'sqlite':
+        return set(connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)
+        ).scalars())
+    return {index['name'] for index in inspector.get_indexes(table_name)}
+
+def missing_indexes(connection):
+    inspector = inspect(connection)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = index_names(connection, inspector, table.name)
+        missing += [index for index in table.indexes if index.name not in existing]
+    return missing
+
+def register_query_audit(app):
+    @app.cli.command('audit-queries')
+    @click.option('--create-missing', is_flag=True, help='Create indexes declared in models.py that the database lacks.')
+    def audit_queries(create_missing):
+        '''EXPLAIN every query pattern the app issues and flag full table scans.'''
+        with db.engine.connect() as connection:
+            missing = missing_indexes(connection)
+            for index in missing:
+                if create_missing:
+                    index.create(connection)
+                    click.echo(f"Created index {index.name} on {index.table.name}")
+                else:
+                    click.echo(f"Missing index {index.name} on {index.table.name} (run with --create-missing)")
+            connection.commit()
+
+            flagged = []
+            for name, build in QUERY_PATTERNS.items():
+                try:
+                    plan = explain(connection, build())
+                except SQLAlchemyError as e:
+                    connection.rollback()
+                    click.echo(f"{'ERROR':<10} {name}: {e.orig}")
+                    continue
+                scans = [line for line in plan if is_full_scan(line)]
+                if scans:
+                    flagged.append(name)
+                click.echo(f"{'FULL SCAN' if scans else 'ok':<10} {name}")
+                for line in plan:
+                    click.echo(f"{'':<10}   {line}")
+
+        click.echo(f"{len(flagged)} of {len(QUERY_PATTERNS)} query patterns scan a full table: {', '.join(flagged) or 'none'}")
@@ -0,0 +1,68 @@
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+class RenderQueue:
+    '''
+    Runs render jobs in a process pool, one job per key at a time.
+    Jobs submitted for a key that is already rendering are merged: only the latest is kept
+    and it starts once the running one finishes.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._lock = threading.RLock()
+        self._running = {}
+        self._pending = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        workers = app.config.get('CALENDAR_RENDER_WORKERS', 0)
+        if workers:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def shutdown(self, wait=True):
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    @property
+    def enabled(self):
+        return self.executor is not None
+
+    def submit(self, key, token, fn, args, on_done=None):
+        job = (token, fn, args, on_done)
+        with self._lock:
+            latest = self._pending.get(key) or self._running.get(key)
+            if latest and latest[0] == token:
+                return
+            if key in self._running:
+                self._pending[key] = job
+                return
+            self._start(key, job)
+
+    def _start(self, key, job):
+        token, fn, args, on_done = job
+        self._running[key] = job
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._finish(key, job, f))
+
+    def _finish(self, key, job, future):
+        token, fn, args, on_done = job
+        error = future.exception()
+        with self.app.app_context():
+            if error:
+                self.app.logger.error(f"Render job for {key} failed: {error}")
+            elif on_done:
+                try:
+                    on_done()
+                except Exception as e:
+                    self.app.logger.error(f"Render callback for {key} failed: {e}")
+
+        with self._lock:
+            self._running.pop(key, None)
+            next_job = self._pending.pop(key, None)
+            if next_job:
+                self._start(key, next_job)
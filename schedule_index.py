@@ -0,0 +1,118 @@
+import threading
+
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import date
+
+def minutes(value):
+    return value.hour * 60 + value.minute
+
+class IntervalList:
+    '''
+    Intervals sorted by start minute. Overlap queries only look at entries that start after
+    (query start - longest interval), so they cost a bisect plus the overlapping entries.
+    '''
+    def __init__(self):
+        self.entries = []
+        self.longest = 0
+
+    def add(self, start, end, event_id):
+        insort(self.entries, (start, end, event_id))
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, event_id):
+        self.entries = [entry for entry in self.entries if entry[2] != event_id]
+
+    def overlapping(self, start, end):
+        lo = bisect_right(self.entries, start - self.longest, key=lambda entry: entry[0])
+        hi = bisect_left(self.entries, end, key=lambda entry: entry[0])
+        return [entry for entry in self.entries[lo:hi] if entry[1] > start]
+
+class ScheduleIndex:
+    '''
+    One user's events: recurring ones per weekday and one-time ones per date.
+    '''
+    def __init__(self, events=()):
+        self.weekly = {day_of_week: IntervalList() for day_of_week in range(7)}
+        self.dated = {}
+        self.events = {}
+        for event in events:
+            self.add(event)
+
+    def add(self, event):
+        start, end = minutes(event.start), minutes(event.end)
+        if event.day:
+            self.dated.setdefault(event.day, IntervalList()).add(start, end, event.id)
+        for recurring_day in event.recurring_days:
+            self.weekly[recurring_day.day_of_week].add(start, end, event.id)
+        self.events[event.id] = (event.title, event.day, event.start, event.end)
+
+    def remove(self, event_id):
+        title, day, start, end = self.events.pop(event_id)
+        if day:
+            self.dated[day].remove(event_id)
+        else:
+            for intervals in self.weekly.values():
+                intervals.remove(event_id)
+
+    def rename(self, event_id, title):
+        if event_id in self.events:
+            self.events[event_id] = (title,) + self.events[event_id][1:]
+
+    def matches(self, events):
+        return len(events) == len(self.events) and all(
+            self.events.get(event.id, ())[1:] == (event.day, event.start, event.end) for event in events
+        )
+
+    def conflicts(self, start, end, day=None, days_of_week=(), today=None):
+        '''
+        Titles of every event overlapping [start, end) on a date (one-time) or on weekdays (recurring),
+        in start order. Recurring days are checked against every one-time event from today onwards.
+        '''
+        start, end = minutes(start), minutes(end)
+        found = []
+        if day:
+            found += self.weekly[day.weekday()].overlapping(start, end)
+            if day in self.dated:
+                found += self.dated[day].overlapping(start, end)
+        today = today or date.today()
+        for day_of_week in days_of_week:
+            found += self.weekly[day_of_week].overlapping(start, end)
+            for dated_day, intervals in self.dated.items():
+                if dated_day >= today and dated_day.weekday() == day_of_week:
+                    found += intervals.overlapping(start, end)
+
+        titles = {}
+        for entry_start, entry_end, event_id in sorted(found):
+            titles.setdefault(event_id, self.events[event_id][0])
+        return list(titles.values())
+
+class ScheduleIndexes:
+    '''
+    Process-wide ScheduleIndex per user, least recently used dropped past max_users.
+    An index is rebuilt whenever it no longer matches the events loaded from the database,
+    which covers changes made by other workers.
+    '''
+    def __init__(self, max_users=1024):
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, events):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None or not index.matches(events):
+                index = ScheduleIndex(events)
+                self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            return index
+
+    def update(self, user_id, change):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                change(index)
+
+schedule_indexes = ScheduleIndexes()
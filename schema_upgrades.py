@@ -0,0 +1,57 @@
+import click
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+
+# Columns added to tables that existing databases already have, since db.create_all() only creates missing tables.
+# (table, column, SQL default that existing rows get, or None)
+ADDED_COLUMNS = [
+    ('calendar_images', 'fingerprint', None),
+    ('notepad_data', 'version', 1),
+]
+
+def missing_columns(engine):
+    inspector = inspect(engine)
+    missing = []
+    for table_name, column_name, default in ADDED_COLUMNS:
+        if not inspector.has_table(table_name):
+            continue
+        if column_name not in {column['name'] for column in inspector.get_columns(table_name)}:
+            missing.append((table_name, column_name, default))
+    return missing
+
+def add_column_ddl(dialect, table_name, column_name, default):
+    column = db.metadata.tables[table_name].c[column_name]
+    quote = dialect.identifier_preparer.quote
+    ddl = f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(column_name)} {column.type.compile(dialect)}"
+    if default is not None:
+        ddl += f" DEFAULT {default}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+def upgrade_schema(engine):
+    '''
+    Adds the columns in ADDED_COLUMNS that the database lacks. Safe to run on every start;
+    returns the "table.column" names it added.
+    '''
+    added = []
+    for table_name, column_name, default in missing_columns(engine):
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(add_column_ddl(engine.dialect, table_name, column_name, default))
+        except SQLAlchemyError:
+            # Another worker starting at the same time may have added it first.
+            if (table_name, column_name, default) in missing_columns(engine):
+                raise
+            continue
+        added.append(f"{table_name}.{column_name}")
+    return added
+
+def register_schema_upgrades(app):
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        '''Add columns that databases created by older versions lack.'''
+        added = upgrade_schema(db.engine)
+        click.echo(f"Added {', '.join(added)}" if added else "Database schema is up to date.")
@@ -246,6 +246,180 @@ function deleteAcceptedCalendarShare() {
     });
 }
 
+// --- Week Calendar ---
+// Draws the week from /api/week in the browser and keeps it current with since=<version> deltas.
+function weekCalendar() {
+    const container = document.getElementById('week-calendar');
+    const imageView = document.getElementById('week-calendar-image');
+    const toggle = document.getElementById('week-calendar-toggle');
+    if (!container || !imageView || !toggle) return;
+
+    const week = container.dataset.week;
+    const api = container.dataset.api;
+    const dayNames = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
+    const state = { version: null, entries: new Map() };
+    let timer = null;
+
+    function minutes(value) {
+        const [hours, mins] = value.split(':').map(Number);
+        return hours * 60 + mins;
+    }
+
+    function weekDates() {
+        const [year, month, day] = week.split('-').map(Number);
+        return dayNames.map((_, offset) => {
+            const date = new Date(year, month - 1, day + offset);
+            const pad = value => String(value).padStart(2, '0');
+            return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+        });
+    }
+
+    // Overlapping events share the column width, like the image's cascade.
+    function layoutDay(entries) {
+        const sorted = entries.slice().sort((a, b) => minutes(a.start) - minutes(b.start) || minutes(b.end) - minutes(a.end));
+        const placed = [];
+        let group = [];
+        let groupEnd = -1;
+
+        function closeGroup() {
+            const lanes = Math.max(0, ...group.map(item => item.lane)) + 1;
+            group.forEach(item => { item.lanes = lanes; });
+            group = [];
+        }
+
+        sorted.forEach(entry => {
+            const start = minutes(entry.start);
+            const end = Math.max(minutes(entry.end), start + 15);
+            if (group.length && start >= groupEnd) closeGroup();
+            const taken = new Set(group.filter(item => item.end > start).map(item => item.lane));
+            let lane = 0;
+            while (taken.has(lane)) lane++;
+            const item = { entry, start, end, lane };
+            group.push(item);
+            placed.push(item);
+            groupEnd = Math.max(groupEnd, end);
+        });
+        if (group.length) closeGroup();
+        return placed;
+    }
+
+    function render() {
+        const grid = document.createElement('div');
+        grid.className = 'week-calendar-grid';
+
+        const hours = document.createElement('div');
+        hours.className = 'week-calendar-hours';
+        for (let hour = 0; hour < 24; hour++) {
+            const label = document.createElement('div');
+            label.textContent = `${String(hour).padStart(2, '0')}:00`;
+            hours.appendChild(label);
+        }
+        grid.appendChild(hours);
+
+        const byDate = new Map();
+        state.entries.forEach(entry => {
+            if (!byDate.has(entry.date)) byDate.set(entry.date, []);
+            byDate.get(entry.date).push(entry);
+        });
+
+        weekDates().forEach((date, index) => {
+            const column = document.createElement('div');
+            column.className = 'week-calendar-day';
+
+            const label = document.createElement('div');
+            label.className = 'week-calendar-day-label';
+            label.textContent = `${dayNames[index]} ${date.slice(5).replace('-', '/')}`;
+            column.appendChild(label);
+
+            const body = document.createElement('div');
+            body.className = 'week-calendar-day-body';
+            layoutDay(byDate.get(date) || []).forEach(({ entry, start, end, lane, lanes }) => {
+                const block = document.createElement('div');
+                block.className = 'week-calendar-event';
+                block.style.top = `calc(${start / 60} * var(--week-calendar-hour-height))`;
+                block.style.height = `calc(${(end - start) / 60} * var(--week-calendar-hour-height))`;
+                block.style.left = `${(lane / lanes) * 100}%`;
+                block.style.width = `${100 / lanes}%`;
+                block.style.backgroundColor = entry.color;
+                block.title = entry.notes || '';
+
+                const title = document.createElement('strong');
+                title.textContent = entry.title;
+                const time = document.createElement('small');
+                time.textContent = `${entry.start} - ${entry.end}`;
+                block.append(title, time);
+                body.appendChild(block);
+            });
+            column.appendChild(body);
+            grid.appendChild(column);
+        });
+
+        container.replaceChildren(grid);
+    }
+
+    async function sync() {
+        const params = new URLSearchParams({ week });
+        if (state.version) params.set('since', state.version);
+        try {
+            const response = await fetch(`${api}?${params}`);
+            if (!response.ok) throw new Error('Failed to load week');
+            const payload = await response.json();
+            if (payload.events) {
+                state.entries = new Map(payload.events.map(entry => [entry.key, entry]));
+            } else {
+                payload.removed.forEach(key => state.entries.delete(key));
+                payload.changed.forEach(entry => state.entries.set(entry.key, entry));
+            }
+            if (payload.version !== state.version) {
+                state.version = payload.version;
+                render();
+            }
+        } catch (err) {
+            console.error('Week sync error:', err);
+        }
+    }
+
+    function show(interactive) {
+        container.classList.toggle('d-none', !interactive);
+        imageView.classList.toggle('d-none', interactive);
+        toggle.textContent = interactive ? 'Image View' : 'Interactive View';
+        localStorage.setItem('weekCalendarView', interactive ? 'interactive' : 'image');
+        clearInterval(timer);
+        if (interactive) {
+            sync();
+            timer = setInterval(() => { if (!document.hidden) sync(); }, 60000);
+        }
+    }
+
+    // The render pool is still drawing this week; swap the image in once its exact version is served.
+    async function waitForRender(img, attempts = 40) {
+        for (let attempt = 0; attempt < attempts; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 1500));
+            try {
+                const response = await fetch(img.dataset.src, { method: 'HEAD', cache: 'no-store' });
+                if (response.ok && response.headers.get('ETag') === `"${img.dataset.version}"`) {
+                    img.srcset = img.dataset.srcset;
+                    img.src = img.dataset.src;
+                    img.classList.remove('d-none');
+                    document.getElementById('week-calendar-pending')?.remove();
+                    return;
+                }
+            } catch (err) {
+                console.error('Render check error:', err);
+            }
+        }
+    }
+
+    const pendingImage = imageView.querySelector('img[data-src]');
+    if (pendingImage) waitForRender(pendingImage);
+
+    toggle.addEventListener('click', () => show(container.classList.contains('d-none')));
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden && !container.classList.contains('d-none')) sync();
+    });
+    show(localStorage.getItem('weekCalendarView') === 'interactive');
+}
+
 // Clock
 let lastSecond = null;
 
@@ -276,45 +450,31 @@ setInterval(updateClock, 1000);
 updateClock();
 
 // Notepad
+// Edits are sent as item operations against the note's version, debounced and coalesced.
+// If another tab saved first, the server's note is shown and the pending operations are replayed on it.
 function updateNotepad() {
     const notepad = document.getElementById('notepad')
     const notepadBody = document.getElementById('notepadBody');
-    if (!notepad || !notepadBody) return;
+    const notepadTitle = document.getElementById('notepadTitle');
+    if (!notepad || !notepadBody || !notepadTitle) return;
     const csrf_token = notepad.getAttribute('data-csrf')
 
-    function getNotepadData() {
-        const title = document.getElementById('notepadTitle')?.innerText.trim() || "";
-        const items = Array.from(document.querySelectorAll('#notepadBody li')).map( li => {
-            const checkbox = li.querySelector('input[type="checkbox"]');
-            const span = li.querySelector('span');
-            return {
-                text: span?.innerText.trim() || "",
-                checked: checkbox?.checked || false
-            };
-        });
-        return {
-            title,
-            body: items
-        };
+    let version = Number(notepad.dataset.version) || 0;
+    let pending = [];
+    let sending = false;
+    let saveTimer = null;
+
+    function newItemId() {
+        return Math.random().toString(16).slice(2, 10).padEnd(8, '0');
     }
 
-    async function saveNotepad() {
-        const note = getNotepadData();
-        console.log(JSON.stringify(note));
-        try {
-            const response = await fetch('/api/notes', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': csrf_token
-                },
-                body: JSON.stringify(note)
-            });
-            if (!response.ok) throw new Error('Failed to save note');
-            console.log('Note saved successfully!');
-        } catch (err) {
-            console.error('Save error:', err);
-        }
+    function itemId(li) {
+        if (!li.dataset.itemId) li.dataset.itemId = newItemId();
+        return li.dataset.itemId;
+    }
+
+    function findItem(id) {
+        return Array.from(notepadBody.children).find(li => li.dataset.itemId === id);
     }
 
     function placeCaretAtEnd(el) {
@@ -330,14 +490,155 @@ function updateNotepad() {
         span.addEventListener('focus', () => placeCaretAtEnd(span));
     }
 
+    function createItem({ id, text = '', checked = false }) {
+        const li = document.createElement('li');
+        li.dataset.itemId = id;
+        li.innerHTML = `
+            <input type='checkbox' class='form-check-input me-2'>
+            <span contenteditable='true'></span>
+            <button class="btn btn-sm btn-link delete-line" title="Delete item">
+                <i class="bi bi-x-lg"></i>
+            </button>
+        `;
+        const span = li.querySelector('span');
+        span.innerText = text;
+        span.classList.toggle('checked', checked);
+        li.querySelector('input').checked = checked;
+        attachCaretBehavior(span);
+        return li;
+    }
+
+    // Mirrors apply_note_ops() in notepad_ops.py.
+    function applyLocally(op) {
+        const li = op.id ? findItem(op.id) : null;
+        if (op.op === 'title') {
+            notepadTitle.innerText = op.title;
+        } else if (op.op === 'insert' && !li) {
+            const after = op.after ? findItem(op.after) : null;
+            const item = createItem(op);
+            if (after) after.after(item);
+            else if (op.after) notepadBody.appendChild(item);
+            else notepadBody.prepend(item);
+        } else if (op.op === 'update' && li) {
+            li.querySelector('span').innerText = op.text;
+        } else if (op.op === 'toggle' && li) {
+            li.querySelector('input').checked = op.checked;
+            li.querySelector('span').classList.toggle('checked', op.checked);
+        } else if (op.op === 'delete' && li) {
+            li.remove();
+        } else if (op.op === 'reorder') {
+            op.ids.map(findItem).filter(Boolean).reverse().forEach(item => notepadBody.prepend(item));
+        }
+    }
+
+    function renderNote(note) {
+        notepadTitle.innerText = note.title;
+        notepadBody.replaceChildren(...note.body.map(createItem));
+    }
+
+    function queue(op) {
+        const sameItem = other => other.id === op.id;
+        if (op.op === 'title') {
+            pending = pending.filter(other => other.op !== 'title');
+        } else if (op.op === 'update' || op.op === 'toggle') {
+            // Not sent yet: fold the change into the insert.
+            const insert = pending.find(other => other.op === 'insert' && sameItem(other));
+            if (insert) {
+                if (op.op === 'update') insert.text = op.text;
+                else insert.checked = op.checked;
+                return schedule();
+            }
+            pending = pending.filter(other => !(other.op === op.op && sameItem(other)));
+        } else if (op.op === 'delete') {
+            const insert = pending.find(other => other.op === 'insert' && sameItem(other));
+            pending = pending.filter(other => !sameItem(other));
+            if (insert) {
+                // The server never saw it, so drop it and anchor later inserts where it was.
+                pending.forEach(other => { if (other.op === 'insert' && other.after === op.id) other.after = insert.after; });
+                return schedule();
+            }
+        }
+        pending.push(op);
+        schedule();
+    }
+
+    function schedule(delay = 800) {
+        clearTimeout(saveTimer);
+        saveTimer = setTimeout(flush, delay);
+    }
+
+    async function flush() {
+        if (sending || pending.length === 0) return;
+        sending = true;
+        const ops = pending;
+        pending = [];
+        let retryDelay = 800;
+        try {
+            const response = await fetch('/api/notes', {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': csrf_token
+                },
+                body: JSON.stringify({ version, ops })
+            });
+            const result = await response.json();
+            if (response.status === 409) {
+                version = result.version;
+                pending = ops.concat(pending);
+                renderNote(result);
+                pending.forEach(applyLocally);
+                retryDelay = 0;
+            } else if (!response.ok) {
+                console.error('Save rejected:', result.error);
+            } else {
+                version = result.version;
+            }
+        } catch (err) {
+            console.error('Save error:', err);
+            pending = ops.concat(pending);
+            retryDelay = 5000;
+        } finally {
+            sending = false;
+            if (pending.length) schedule(retryDelay);
+        }
+    }
+
+    // A new note has nothing on the server yet, so its first save inserts what is on screen.
+    if (version === 0) {
+        let after = null;
+        notepadBody.querySelectorAll('li').forEach(li => {
+            const id = itemId(li);
+            pending.push({
+                op: 'insert',
+                id,
+                after,
+                text: li.querySelector('span')?.innerText.trim() || '',
+                checked: li.querySelector('input[type="checkbox"]')?.checked || false
+            });
+            after = id;
+        });
+    }
+
     notepadBody.querySelectorAll('span[contenteditable]').forEach(attachCaretBehavior);
 
+    notepadTitle.addEventListener('input', () => {
+        queue({ op: 'title', title: notepadTitle.innerText.trim() });
+    });
+
+    notepadBody.addEventListener('input', function (e) {
+        if (e.target.matches('span[contenteditable]')) {
+            queue({ op: 'update', id: itemId(e.target.closest('li')), text: e.target.innerText.trim() });
+        }
+    });
+
     notepadBody.addEventListener('change', function (e) {
         if (e.target.matches('input[type="checkbox"]')) {
             const span = e.target.nextElementSibling;
             if (span && span.tagName === 'SPAN') {
                 span.classList.toggle('checked', e.target.checked);
             }
+            queue({ op: 'toggle', id: itemId(e.target.closest('li')), checked: e.target.checked });
         }
     });
 
@@ -348,19 +649,11 @@ function updateNotepad() {
             const currentLi = e.target.closest('li');
             if (!currentLi) return;
 
-            const newLi = document.createElement('li');
-            newLi.innerHTML = `
-                <input type='checkbox' class='form-check-input me-2'>
-                <span contenteditable='true'></span>
-                <button class="btn btn-sm btn-link delete-line" title="Delete item">
-                    <i class="bi bi-x-lg"></i>
-                </button>
-            `;
-            notepadBody.insertBefore(newLi, currentLi.nextSibling);
-
-            const newSpan = newLi.querySelector('span');
-            attachCaretBehavior(newSpan);
-            newSpan.focus();
+            const newLi = createItem({ id: newItemId() });
+            currentLi.after(newLi);
+            queue({ op: 'insert', id: newLi.dataset.itemId, after: itemId(currentLi), text: '', checked: false });
+
+            newLi.querySelector('span').focus();
         }
         if (e.key === 'Backspace') {
             const span = e.target;
@@ -374,6 +667,7 @@ function updateNotepad() {
                 const li = span.closest('li');
                 if (li && notepadBody.children.length > 1) {
                     const prev = li.previousElementSibling?.querySelector('span');
+                    queue({ op: 'delete', id: itemId(li) });
                     li.remove();
                     if (prev) prev.focus();
                 }
@@ -386,6 +680,7 @@ function updateNotepad() {
         if (deleteBtn) {
             const li = deleteBtn.closest('li');
             if (li && notepadBody.children.length > 1) {
+                queue({ op: 'delete', id: itemId(li) });
                 li.classList.add('fade-out')
                 setTimeout(() => li.remove(), 200);
             } else if (li) {
@@ -393,6 +688,9 @@ function updateNotepad() {
                 const checkbox = li.querySelector('input[type="checkbox"]');
                 if (span) span. innerText = '';
                 if (checkbox) checkbox.checked = false;
+                if (span) span.classList.remove('checked');
+                queue({ op: 'update', id: itemId(li), text: '' });
+                queue({ op: 'toggle', id: itemId(li), checked: false });
             }
         }
     });
@@ -400,20 +698,20 @@ function updateNotepad() {
     notepad.addEventListener('focusout', () => {
         setTimeout(() => {
             if (!notepad.contains(document.activeElement)) {
-                saveNotepad();
+                schedule(0);
             }
         }, 50);
     });
 
     window.addEventListener('beforeunload', () => {
-        const note = getNotepadData();
+        if (pending.length === 0) return;
         fetch('/api/notes', {
-            method: 'POST',
+            method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': csrf_token
             },
-            body: JSON.stringify(note),
+            body: JSON.stringify({ version, ops: pending }),
             keepalive: true
         });
     });
@@ -424,7 +722,7 @@ document.addEventListener("DOMContentLoaded", () => {
     formFieldFocus({ fieldID: 'loginFormIdentifierField' });
     formFieldFocus({
         triggerID: 'shareCalendarRequestModal',
-        fieldID: 'share_calendar_request_form_identifier_field',
+        fieldID: 'share_calendar_request_form_identifiers_field',
         triggerType: 'modal'
     });
     formFieldFocus({ fieldID: 'change-password-form-current-password' });
@@ -446,5 +744,6 @@ document.addEventListener("DOMContentLoaded", () => {
     shareCalendarCarousel();
     deleteCalendarShareRequest();
     deleteAcceptedCalendarShare();
+    weekCalendar();
     updateNotepad();
 });
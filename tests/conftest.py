@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app is built at import time, so point it at an in-memory database first.
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ['THROTTLE_BACKEND'] = 'off'
+# Tests drain the outbox themselves.
+os.environ['MAIL_OUTBOX_INTERVAL'] = '0'
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from app import app as flask_app
+from extensions import db
+from models import User, UserTheme
+
+flask_app.config['WTF_CSRF_ENABLED'] = False
+
+@pytest.fixture
+def app():
+    # Requests get their own app context, as they do when served, so nothing in g outlives one.
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield flask_app
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username):
+        with app.app_context():
+            user = User(first_name='Test', last_name='User', username=username, email=f"{username}@example.com", password='-')
+            user.theme = UserTheme(theme='dark')
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make_user
+
+@pytest.fixture
+def login(app):
+    def login(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+        return client
+    return login
+
+@pytest.fixture
+def count_queries(app):
+    '''
+    Call with a function; returns how many statements it sent to the database.
+    '''
+    with app.app_context():
+        engine = db.engine
+
+    def count_queries(fn):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        return len(statements)
+    return count_queries
@@ -0,0 +1,30 @@
+import os
+import time
+
+from calendar_storage import LocalCalendarStorage, calendar_storage
+from helpers import prune_calendar_cache
+
+def test_prune_keeps_newest_viewed_renders_within_budget(app, tmp_path, monkeypatch):
+    storage = LocalCalendarStorage(str(tmp_path))
+    monkeypatch.setattr(calendar_storage, 'backend', storage)
+    monkeypatch.setitem(app.config, 'CALENDAR_CACHE_MAX_BYTES', 300)
+    now = time.time()
+
+    def store(name, accessed, modified):
+        storage.write('token', name, b'x' * 100)
+        os.utime(storage.path('token', name), (now - accessed, now - modified))
+
+    store('2026-10-04.aaa.png', 40 * 86400, 40 * 86400)  # not viewed for longer than CALENDAR_CACHE_MAX_AGE
+    store('2026-10-11.old.png', 10, 100)  # replaced by a newer render of its week
+    store('2026-10-11.new.png', 5, 50)
+    store('2026-10-11.new.thumb.png', 5, 50)
+    store('2026-10-18.cur.png', 1000, 1000)  # least recently viewed, but kept
+    store('2026-10-25.bbb.png', 500, 500)
+    store('2026-11-01.ccc.png', 20, 20)  # over budget once the thumbnail counts towards its render
+
+    with app.app_context():
+        prune_calendar_cache('token', keep={'2026-10-18.cur.png'})
+
+    assert sorted(stored.name for stored in storage.list('token')) == [
+        '2026-10-11.new.png', '2026-10-11.new.thumb.png', '2026-10-18.cur.png',
+    ]
@@ -0,0 +1,37 @@
+from sqlalchemy import select
+
+from calendar_shares import DUPLICATE, NOT_FOUND, OWNER, SENT, parse_identifiers, share_calendar
+from extensions import db
+from models import CalendarImage, CalendarShare
+
+def test_same_user_by_username_and_email_is_one_request(app, make_user):
+    owner, bob = make_user('owner'), make_user('bob')
+    with app.app_context():
+        image = CalendarImage(owner_id=owner, secure_token='token')
+        db.session.add(image)
+        db.session.flush()
+
+        identifiers = parse_identifiers('Bob, bob@example.com; nobody owner owner@example.com')
+        assert share_calendar(image, identifiers) == [
+            ('Bob', SENT),
+            ('bob@example.com', DUPLICATE),
+            ('nobody', NOT_FOUND),
+            ('owner', OWNER),
+            ('owner@example.com', DUPLICATE),
+        ]
+        db.session.commit()
+        assert db.session.execute(select(CalendarShare.viewer_id)).scalars().all() == [bob]
+
+def test_share_request_reports_duplicates(app, make_user, login):
+    owner, _ = make_user('owner'), make_user('bob')
+    with app.app_context():
+        db.session.add(CalendarImage(owner_id=owner, secure_token='token'))
+        db.session.commit()
+        image_id = db.session.execute(select(CalendarImage.id)).scalar_one()
+
+    response = login(owner).post('/share-calendar-request', json={'image_id': image_id, 'identifiers': ['bob', 'BOB@example.com']})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'identifier': 'bob', 'result': SENT},
+        {'identifier': 'BOB@example.com', 'result': DUPLICATE},
+    ]
@@ -0,0 +1,33 @@
+import os
+import time
+
+from calendar_storage import LEFTOVER_SECONDS, LocalCalendarStorage, calendar_storage
+from extensions import db
+from models import CalendarImage
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+def test_gc_removes_directories_it_leaves_empty(app, make_user, tmp_path, monkeypatch):
+    monkeypatch.setattr(calendar_storage, 'backend', LocalCalendarStorage(str(tmp_path)))
+    owner = make_user('owner')
+    with app.app_context():
+        db.session.add_all([CalendarImage(owner_id=owner, secure_token='live-pruned'), CalendarImage(owner_id=owner, secure_token='live-new')])
+        db.session.commit()
+
+        orphan = calendar_storage.backend.directory('orphan')
+        os.makedirs(orphan)
+        open(os.path.join(orphan, '2026-10-18.abc.png'), 'wb').close()
+        pruned = calendar_storage.backend.directory('live-pruned')
+        os.makedirs(pruned)
+        age(pruned, LEFTOVER_SECONDS + 60)
+        # Created for a render the pool has not written yet.
+        os.makedirs(calendar_storage.backend.directory('live-new'))
+
+        removed = calendar_storage.collect_garbage()
+
+    assert removed['orphans'] == 1
+    assert removed['directories'] == 2
+    assert sorted(os.listdir(tmp_path)) == ['li']
+    assert os.listdir(tmp_path / 'li') == ['live-new']
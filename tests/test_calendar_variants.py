@@ -0,0 +1,18 @@
+from PIL import Image
+
+from calendar_storage import LocalCalendarStorage
+from helpers import CALENDAR_VARIANT_WIDTHS, build_week_schedule_png
+
+def test_render_writes_its_variants(app, tmp_path):
+    storage = LocalCalendarStorage(str(tmp_path))
+    with app.app_context():
+        build_week_schedule_png(storage, 'token', '2026-10-18.abc.png', "someone's Schedule", '2026-10-18 - 2026-10-24', [], engine='native')
+
+    names = sorted(stored.name for stored in storage.list('token'))
+    assert names == sorted(['2026-10-18.abc.png', *(f"2026-10-18.abc.{variant}.png" for variant in CALENDAR_VARIANT_WIDTHS)])
+    with Image.open(storage.open('token', '2026-10-18.abc.png')) as full:
+        assert full.width > CALENDAR_VARIANT_WIDTHS['medium']
+    for variant, width in CALENDAR_VARIANT_WIDTHS.items():
+        with Image.open(storage.open('token', f"2026-10-18.abc.{variant}.png")) as copy:
+            assert copy.width == width
+    assert not list(tmp_path.rglob('*.tmp'))
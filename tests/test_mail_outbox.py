@@ -0,0 +1,112 @@
+import smtplib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from extensions import db, mail
+from mail_outbox import mail_outbox
+from models import OutboxEmail
+
+class StubConnection:
+    '''
+    Stands in for the SMTP connection from mail.connect(); recipients in fail_for are refused.
+    '''
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, message):
+        if set(message.recipients) & self.fail_for:
+            raise smtplib.SMTPServerDisconnected('connection dropped')
+        self.sent.extend(message.recipients)
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    connection = StubConnection()
+    monkeypatch.setattr(mail, 'connect', lambda: connection)
+    with app.app_context():
+        yield connection
+
+def queue(*recipients):
+    emails = [mail_outbox.queue(recipient, 'Subject', 'Body') for recipient in recipients]
+    db.session.commit()
+    return [email.id for email in emails]
+
+def outbox(email_id):
+    db.session.expire_all()
+    return db.session.get(OutboxEmail, email_id)
+
+def test_drain_sends_a_batch_over_one_connection(smtp):
+    first, second = queue('a@example.com', 'b@example.com')
+    assert mail_outbox.drain() == 2
+    assert smtp.sent == ['a@example.com', 'b@example.com']
+    for email_id in (first, second):
+        email = outbox(email_id)
+        assert email.sent and email.locked_until is None and email.attempts == 0
+    assert mail_outbox.drain() == 0
+
+def test_transient_failure_is_retried_with_backoff(app, smtp):
+    smtp.fail_for.add('b@example.com')
+    sent, failed = queue('a@example.com', 'b@example.com')
+    before = datetime.now()
+    assert mail_outbox.drain() == 2
+
+    email = outbox(failed)
+    assert email.sent is None and email.attempts == 1 and email.locked_until is None
+    assert email.last_error == 'connection dropped'
+    assert email.next_attempt >= before + timedelta(seconds=app.config['MAIL_OUTBOX_BACKOFF'])
+    assert outbox(sent).sent
+
+    # Not due again until the backoff has passed.
+    assert mail_outbox.drain() == 0
+    email.next_attempt = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    smtp.fail_for.clear()
+    assert mail_outbox.drain() == 1
+    assert outbox(failed).sent and smtp.sent == ['a@example.com', 'b@example.com']
+
+    # The delay doubles with every failed attempt.
+    smtp.fail_for.add('c@example.com')
+    [again] = queue('c@example.com')
+    mail_outbox.drain()
+    email = outbox(again)
+    email.next_attempt = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    before = datetime.now()
+    mail_outbox.drain()
+    assert outbox(again).attempts == 2
+    assert outbox(again).next_attempt >= before + timedelta(seconds=2 * app.config['MAIL_OUTBOX_BACKOFF'])
+
+def test_expired_lease_is_leased_again(smtp):
+    [email_id] = queue('a@example.com')
+    email = outbox(email_id)
+
+    # Another worker holds the lease.
+    email.locked_until = datetime.now() + timedelta(minutes=1)
+    db.session.commit()
+    assert mail_outbox.drain() == 0
+    assert smtp.sent == []
+
+    # That worker died without sending; once its lease runs out the email is claimed and sent.
+    email.locked_until = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    assert mail_outbox.drain() == 1
+    assert smtp.sent == ['a@example.com']
+    assert outbox(email_id).locked_until is None
+
+def test_purge_deletes_only_old_sent_emails(app, smtp):
+    old, recent, unsent = queue('old@example.com', 'recent@example.com', 'unsent@example.com')
+    retention = timedelta(days=app.config['MAIL_OUTBOX_RETENTION_DAYS'])
+    for email_id, sent in ((old, datetime.now() - retention - timedelta(hours=1)), (recent, datetime.now() - retention + timedelta(hours=1))):
+        outbox(email_id).sent = sent
+        db.session.commit()
+
+    assert mail_outbox.purge() == 1
+    assert db.session.execute(select(OutboxEmail.id).order_by(OutboxEmail.id)).scalars().all() == [recent, unsent]
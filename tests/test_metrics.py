@@ -0,0 +1,9 @@
+import helpers
+
+def test_quote_fetch_is_recorded_outside_a_request(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'inspire', lambda: {'text': 'Keep going.', 'author': 'Someone'})
+    helpers.refresh_daily_quote(str(tmp_path / 'quote.json'), '2026-10-18')
+
+    lines = app.test_client().get('/metrics').text.splitlines()
+    assert 'igkh_quote_fetch_seconds_count{endpoint="background"} 1' in lines
+    assert not any(line.startswith('igkh_http_seconds') for line in lines)
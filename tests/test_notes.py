@@ -0,0 +1,69 @@
+from sqlalchemy import update
+
+import app as app_module
+from extensions import db
+from models import NotepadData
+
+def insert(item_id, text, after=None):
+    return {'op': 'insert', 'id': item_id, 'after': after, 'text': text, 'checked': False}
+
+def save(client, version, ops):
+    return client.patch('/api/notes', json={'version': version, 'ops': ops})
+
+def test_save_bumps_the_version(app, make_user, login):
+    client = login(make_user('notes'))
+    response = save(client, 0, [insert('a', 'milk')])
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 1
+
+    response = save(client, 1, [{'op': 'toggle', 'id': 'a', 'checked': True}])
+    assert response.get_json()['version'] == 2
+
+def test_stale_version_gets_409_with_the_current_note(app, make_user, login):
+    client = login(make_user('stale'))
+    save(client, 0, [insert('a', 'milk'), {'op': 'title', 'title': 'Shopping'}])
+
+    # A second tab still on version 0.
+    response = save(client, 0, [insert('b', 'eggs', after='a')])
+    assert response.status_code == 409
+    state = response.get_json()
+    assert state['status'] == 'stale'
+    assert state['version'] == 1
+    assert state['title'] == 'Shopping'
+    assert [item['id'] for item in state['body']] == ['a']
+
+    # Replaying on the returned version saves; the op that already landed is not applied twice.
+    response = save(client, state['version'], [insert('a', 'milk'), insert('b', 'eggs', after='a')])
+    assert response.status_code == 200
+    assert response.get_json()['version'] == 2
+    with app.app_context():
+        note = db.session.execute(db.select(NotepadData)).scalars().one()
+        assert [item['text'] for item in note.body] == ['milk', 'eggs']
+
+def test_write_racing_another_save_gets_409(app, make_user, login, monkeypatch):
+    user_id = make_user('race')
+    client = login(user_id)
+    save(client, 0, [insert('a', 'milk')])
+    apply_note_ops = app_module.apply_note_ops
+
+    def save_elsewhere_first(title, body, ops):
+        # Another tab commits between this request's read and its write.
+        db.session.execute(
+            update(NotepadData)
+            .filter(NotepadData.user_id == user_id)
+            .values(version=NotepadData.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return apply_note_ops(title, body, ops)
+    monkeypatch.setattr(app_module, 'apply_note_ops', save_elsewhere_first)
+
+    response = save(client, 1, [insert('b', 'eggs', after='a')])
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'stale'
+
+def test_invalid_ops_are_rejected(app, make_user, login):
+    client = login(make_user('invalid'))
+    response = save(client, 0, [{'op': 'explode'}])
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'invalid'
+    assert save(client, 0, {'op': 'insert'}).status_code == 400
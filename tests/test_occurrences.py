@@ -0,0 +1,79 @@
+from datetime import date, time, timedelta
+
+from extensions import db
+from helpers import week_start
+from models import CalendarEvent, CalendarEventDay, CalendarOccurrence, OccurrenceWindow
+from occurrences import add_event_occurrences, get_events_between, get_events_on, occurrence_window
+
+THIS_WEEK = week_start(date.today())
+
+def add_event(user_id, title, start, day=None, days_of_week=()):
+    event = CalendarEvent(user_id=user_id, title=title, start=time(start), end=time(start + 1), color='#336699', day=day)
+    event.recurring_days = [CalendarEventDay(day_of_week=day_of_week) for day_of_week in days_of_week]
+    db.session.add(event)
+    db.session.flush()
+    return event
+
+def occurrences(user_id, start, end):
+    return [(day, event.title) for day, event in get_events_between(user_id, start, end)]
+
+def test_window_spans_last_week_to_the_configured_days(app):
+    with app.app_context():
+        start, end = occurrence_window(date(2026, 10, 21))
+    assert start == date(2026, 10, 11)
+    assert end == date(2026, 10, 18) + timedelta(days=app.config.get('OCCURRENCE_WINDOW_DAYS', 56) - 1)
+
+def test_recurring_and_one_time_events_by_date(app, make_user):
+    user_id = make_user('occurrences')
+    monday, wednesday = THIS_WEEK + timedelta(days=1), THIS_WEEK + timedelta(days=3)
+    with app.app_context():
+        add_event(user_id, 'Gym', 18, days_of_week=[monday.weekday(), wednesday.weekday()])
+        add_event(user_id, 'Dentist', 9, day=wednesday)
+        db.session.commit()
+
+        assert occurrences(user_id, THIS_WEEK, THIS_WEEK + timedelta(days=6)) == [
+            (monday, 'Gym'), (wednesday, 'Dentist'), (wednesday, 'Gym'),
+        ]
+        assert [event.title for event in get_events_on(user_id, wednesday)] == ['Dentist', 'Gym']
+        assert get_events_on(user_id, THIS_WEEK) == []
+
+def test_new_event_is_added_to_a_built_window(app, make_user):
+    user_id = make_user('added')
+    tuesday = THIS_WEEK + timedelta(days=2)
+    with app.app_context():
+        assert get_events_on(user_id, tuesday) == []
+        event = add_event(user_id, 'Lunch', 12, days_of_week=[tuesday.weekday()])
+        add_event_occurrences(event)
+        db.session.commit()
+
+        next_tuesday = tuesday + timedelta(days=7)
+        assert occurrences(user_id, tuesday, next_tuesday) == [(tuesday, 'Lunch'), (next_tuesday, 'Lunch')]
+
+def test_moved_window_is_rebuilt(app, make_user):
+    user_id = make_user('moved')
+    with app.app_context():
+        add_event(user_id, 'Standup', 9, days_of_week=[THIS_WEEK.weekday()])
+        db.session.commit()
+        get_events_on(user_id, THIS_WEEK)
+
+        # As if last built a few weeks ago.
+        window = db.session.get(OccurrenceWindow, user_id)
+        window.start -= timedelta(days=21)
+        window.end -= timedelta(days=21)
+        db.session.execute(CalendarOccurrence.__table__.delete().where(CalendarOccurrence.date >= THIS_WEEK))
+        db.session.commit()
+
+        assert [event.title for event in get_events_on(user_id, THIS_WEEK)] == ['Standup']
+        window = db.session.get(OccurrenceWindow, user_id)
+        assert (window.start, window.end) == occurrence_window()
+
+def test_dashboard_lists_todays_events(app, make_user, login):
+    user_id = make_user('dashboard')
+    with app.app_context():
+        add_event(user_id, 'Physio', 9, day=date.today())
+        add_event(user_id, 'Haircut', 9, day=date.today() + timedelta(days=1))
+        db.session.commit()
+
+    page = login(user_id).get('/dashboard').get_data(as_text=True)
+    assert 'Physio' in page
+    assert 'Haircut' not in page
@@ -0,0 +1,74 @@
+from sqlalchemy import func, select
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from extensions import db
+from models import PreviousPassword, User
+from passwords import passwords
+
+OLD_METHOD = 'pbkdf2:sha256:1000'
+
+def set_password(app, user_id, password, method=OLD_METHOD):
+    with app.app_context():
+        db.session.get(User, user_id).password = generate_password_hash(password, method)
+        db.session.commit()
+
+def log_in(app, username, password):
+    return app.test_client().post('/login', data={'form_type': 'login', 'identifier': username, 'password': password, 'theme': 'dark'})
+
+def test_login_rehashes_an_outdated_hash(app, make_user):
+    user_id = make_user('rehash')
+    set_password(app, user_id, 'correct horse')
+
+    assert log_in(app, 'rehash', 'wrong').headers['Location'].endswith('/login')
+    with app.app_context():
+        assert db.session.get(User, user_id).password.startswith(OLD_METHOD)
+
+    assert log_in(app, 'rehash', 'correct horse').headers['Location'].endswith('/dashboard')
+    with app.app_context():
+        password_hash = db.session.get(User, user_id).password
+    assert not passwords.needs_rehash(password_hash)
+    assert check_password_hash(password_hash, 'correct horse')
+
+def test_current_hash_is_left_alone(app, make_user):
+    user_id = make_user('current')
+    set_password(app, user_id, 'correct horse', passwords.method)
+    with app.app_context():
+        before = db.session.get(User, user_id).password
+
+    log_in(app, 'current', 'correct horse')
+    with app.app_context():
+        assert db.session.get(User, user_id).password == before
+
+def test_reuse_checks_the_current_and_recent_passwords(app, make_user):
+    user_id = make_user('history')
+    set_password(app, user_id, 'first')
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for password in ('second', 'third'):
+            passwords.change(user, password)
+        db.session.commit()
+
+        assert passwords.is_reused(user, 'third')
+        assert passwords.is_reused(user, 'first')
+        assert passwords.is_reused(user, 'second')
+        assert not passwords.is_reused(user, 'fourth')
+
+def test_history_is_trimmed(app, make_user, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HISTORY', 2)
+    user_id = make_user('trimmed')
+    set_password(app, user_id, 'p0')
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for i in range(1, 5):
+            passwords.change(user, f"p{i}")
+        db.session.commit()
+
+        assert db.session.execute(
+            select(func.count())
+            .select_from(PreviousPassword)
+            .filter(PreviousPassword.user_id == user_id)
+        ).scalar() == 2
+        # p0 and p1 fell out of the history.
+        assert not passwords.is_reused(user, 'p1')
+        assert passwords.is_reused(user, 'p2')
+        assert passwords.is_reused(user, 'p4')
@@ -0,0 +1,7 @@
+import pytest
+
+@pytest.mark.parametrize('week', ['0001-01-01', '9999-12-31'])
+@pytest.mark.parametrize('path', ['/week-schedule', '/api/week'])
+def test_weeks_at_the_ends_of_the_date_range(app, make_user, login, path, week):
+    client = login(make_user('someone'))
+    assert client.get(f"{path}?week={week}").status_code == 200
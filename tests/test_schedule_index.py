@@ -0,0 +1,68 @@
+from datetime import date, time
+from types import SimpleNamespace
+
+from schedule_index import ScheduleIndex, ScheduleIndexes
+
+MONDAY = date(2026, 10, 19)
+
+def event(event_id, title, start, end, day=None, days_of_week=()):
+    return SimpleNamespace(
+        id=event_id, title=title, start=time(*start), end=time(*end), day=day,
+        recurring_days=[SimpleNamespace(day_of_week=day_of_week) for day_of_week in days_of_week],
+    )
+
+def test_one_time_event_conflicts_with_recurring_and_dated_events():
+    index = ScheduleIndex([
+        event(1, 'Standup', (9, 0), (9, 30), days_of_week=[0, 2]),
+        event(2, 'Dentist', (10, 0), (11, 0), day=MONDAY),
+        event(3, 'Gym', (18, 0), (19, 0), days_of_week=[1]),
+    ])
+    assert index.conflicts(time(9, 15), time(10, 30), day=MONDAY) == ['Standup', 'Dentist']
+    # Tuesday only has the gym.
+    assert index.conflicts(time(9, 0), time(11, 0), day=date(2026, 10, 20)) == []
+
+def test_back_to_back_events_do_not_conflict():
+    index = ScheduleIndex([event(1, 'Standup', (9, 0), (9, 30), days_of_week=[0])])
+    assert index.conflicts(time(8, 0), time(9, 0), day=MONDAY) == []
+    assert index.conflicts(time(9, 30), time(10, 0), days_of_week=[0]) == []
+
+def test_recurring_event_conflicts_with_upcoming_one_time_events_only():
+    index = ScheduleIndex([
+        event(1, 'Past', (9, 0), (10, 0), day=date(2026, 10, 12)),
+        event(2, 'Upcoming', (9, 0), (10, 0), day=MONDAY),
+    ])
+    assert index.conflicts(time(9, 30), time(10, 30), days_of_week=[0], today=date(2026, 10, 18)) == ['Upcoming']
+
+def test_long_event_is_found_from_a_later_start():
+    index = ScheduleIndex([
+        event(1, 'Workshop', (8, 0), (17, 0), day=MONDAY),
+        event(2, 'Coffee', (10, 0), (10, 15), day=MONDAY),
+    ])
+    assert index.conflicts(time(16, 0), time(16, 30), day=MONDAY) == ['Workshop']
+
+def test_removed_and_renamed_events():
+    index = ScheduleIndex([
+        event(1, 'Standup', (9, 0), (9, 30), days_of_week=[0]),
+        event(2, 'Dentist', (9, 0), (10, 0), day=MONDAY),
+    ])
+    index.remove(1)
+    index.rename(2, 'Doctor')
+    assert index.conflicts(time(9, 0), time(9, 30), day=MONDAY) == ['Doctor']
+
+def test_index_is_rebuilt_when_events_change_elsewhere():
+    indexes = ScheduleIndexes()
+    events = [event(1, 'Standup', (9, 0), (9, 30), days_of_week=[0])]
+    first = indexes.get(7, events)
+    assert indexes.get(7, events) is first
+
+    # Another worker moved the event.
+    moved = [event(1, 'Standup', (11, 0), (11, 30), days_of_week=[0])]
+    index = indexes.get(7, moved)
+    assert index is not first
+    assert index.conflicts(time(11, 0), time(12, 0), day=MONDAY) == ['Standup']
+
+def test_least_recently_used_index_is_dropped():
+    indexes = ScheduleIndexes(max_users=2)
+    for user_id in (1, 2, 3):
+        indexes.get(user_id, [])
+    assert list(indexes._indexes) == [2, 3]
@@ -0,0 +1,32 @@
+import pytest
+from flask import Flask
+
+from throttle import Throttle
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def throttle(request, tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(THROTTLE_BACKEND=request.param, THROTTLE_LIMITS={'login': (3, 300)})
+    return Throttle(app)
+
+def test_empty_ip_bucket_refuses(throttle):
+    for i in range(3):
+        assert throttle.hit('login', '10.0.0.1', f"user{i}") == 0
+    assert throttle.hit('login', '10.0.0.1', 'user9') > 0
+    assert throttle.hit('login', '10.0.0.2', 'user9') == 0
+
+def test_one_address_cannot_keep_trying_one_account(throttle):
+    for _ in range(3):
+        assert throttle.hit('login', '10.0.0.1', 'victim') == 0
+    assert throttle.hit('login', '10.0.0.1', 'Victim ') > 0
+
+def test_drained_account_refuses_only_addresses_that_tried_it(throttle):
+    for i in range(3):
+        assert throttle.hit('login', f"10.0.0.{i}", 'victim') == 0
+
+    # Every address that took part is refused, before any password work.
+    for i in range(3):
+        assert throttle.hit('login', f"10.0.0.{i}", 'victim') > 0
+    # The owner, from an address of their own, is not locked out.
+    assert throttle.hit('login', '192.168.1.5', 'victim') == 0
+    assert throttle.hit('login', '10.0.0.0', 'someone-else') == 0
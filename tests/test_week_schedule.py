@@ -0,0 +1,57 @@
+from datetime import date, time
+from types import SimpleNamespace
+
+from helpers import database_to_calendarview, week_schedule_entries
+
+WEEK = date(2026, 10, 21)
+MONDAY = date(2026, 10, 19)
+
+def event(event_id, start, end, day=None, days_of_week=()):
+    return SimpleNamespace(
+        id=event_id, title=f"Event {event_id}", notes=None, color='#336699',
+        start=time(*start), end=time(*end), day=day,
+        recurring_days=[SimpleNamespace(day_of_week=day_of_week) for day_of_week in days_of_week],
+    )
+
+def shown(events):
+    return [(event.id, day, weekday) for event, day, weekday in week_schedule_entries(events, WEEK)]
+
+def test_recurring_event_is_hidden_where_a_one_time_event_overlaps():
+    events = [
+        event(1, (9, 0), (10, 0), day=MONDAY),
+        event(2, (9, 30), (10, 30), days_of_week=[0, 1]),
+    ]
+    # Monday has the one-time event only; Tuesday keeps the recurring one.
+    assert shown(events) == [(1, MONDAY, 0), (2, None, 1)]
+
+def test_touching_events_both_show():
+    events = [
+        event(1, (9, 0), (10, 0), day=MONDAY),
+        event(2, (10, 0), (11, 0), days_of_week=[0]),
+        event(3, (8, 0), (9, 0), days_of_week=[0]),
+    ]
+    assert shown(events) == [(1, MONDAY, 0), (2, None, 0), (3, None, 0)]
+
+def test_overlap_with_merged_one_time_spans():
+    events = [
+        event(1, (9, 0), (10, 0), day=MONDAY),
+        event(2, (9, 30), (12, 0), day=MONDAY),
+        event(3, (11, 30), (13, 0), days_of_week=[0]),
+        event(4, (12, 0), (13, 0), days_of_week=[0]),
+    ]
+    assert shown(events) == [(1, MONDAY, 0), (2, MONDAY, 0), (4, None, 0)]
+
+def test_one_time_events_outside_the_week_do_not_hide_anything():
+    events = [
+        event(1, (9, 0), (10, 0), day=date(2026, 10, 12)),
+        event(2, (9, 0), (10, 0), days_of_week=[0]),
+    ]
+    assert shown(events) == [(2, None, 0)]
+
+def test_calendarview_events():
+    calendar_events = database_to_calendarview([
+        event(1, (9, 0), (10, 0), day=MONDAY),
+        event(2, (14, 0), (15, 0), days_of_week=[2]),
+    ], WEEK)
+    assert [e.title.split('\n')[0] for e in calendar_events] == ['Event 1', 'Event 2']
+    assert [e.start_time for e in calendar_events] == [time(9, 0), time(14, 0)]
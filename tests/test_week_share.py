@@ -0,0 +1,31 @@
+from extensions import db
+from models import CalendarImage, CalendarShare, CalendarShareStatus
+
+STATUSES = [CalendarShareStatus.DECLINED, CalendarShareStatus.PENDING, CalendarShareStatus.ACCEPTED]
+
+def share_both_ways(app, me, others):
+    with app.app_context():
+        images = {user_id: CalendarImage(owner_id=user_id, secure_token=f"token-{user_id}") for user_id in [me, *others]}
+        db.session.add_all(images.values())
+        db.session.flush()
+        for i, other in enumerate(others):
+            db.session.add(CalendarShare(image_id=images[other].id, viewer_id=me, status=STATUSES[i % 3]))
+            db.session.add(CalendarShare(image_id=images[me].id, viewer_id=other, status=STATUSES[i % 3]))
+        db.session.commit()
+
+def week_share_queries(app, make_user, login, count_queries, prefix, shares):
+    me = make_user(f"{prefix}me")
+    share_both_ways(app, me, [make_user(f"{prefix}{i}") for i in range(shares)])
+    client = login(me)
+
+    def get():
+        response = client.get('/week-share')
+        assert response.status_code == 200
+    return count_queries(get)
+
+def test_week_share_query_count_does_not_grow_with_shares(app, make_user, login, count_queries):
+    few = week_share_queries(app, make_user, login, count_queries, 'few', 3)
+    many = week_share_queries(app, make_user, login, count_queries, 'many', 30)
+    assert few == many
+    # The user loader, then the share lists with images, owners and viewers joined in.
+    assert many == 2
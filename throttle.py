@@ -0,0 +1,159 @@
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+# Attempts allowed in a burst, and seconds for an empty bucket to fill up again.
+THROTTLE_LIMITS = {
+    'login': (10, 300),
+    'forgot_password': (5, 900),
+    'verify_reset_code': (10, 900),
+}
+
+def refill(tokens, updated, now, capacity, period):
+    return min(capacity, tokens + (now - updated) * capacity / period)
+
+def retry_after(tokens, capacity, period):
+    # Seconds until the bucket holds a whole token again.
+    return (1 - tokens) * period / capacity
+
+def take_tokens(levels, keys, capacity, period):
+    '''
+    Given the refilled levels of keys (the client IP's bucket, then optionally its pair bucket with the identifier
+    and the identifier's own), returns the levels to store and 0 if the attempt is allowed, otherwise the seconds until it would be.
+    The identifier's bucket only refuses addresses that have already tried that identifier, so draining it from
+    many addresses does not lock its owner out of signing in from another.
+    '''
+    waits = {key: retry_after(levels[key], capacity, period) if levels[key] < 1 else 0 for key in keys}
+    ip, *identifier_keys = keys
+    wait = waits[ip]
+    if identifier_keys:
+        pair, identifier = identifier_keys
+        wait = max(wait, waits[pair])
+        if levels[pair] < capacity:
+            wait = max(wait, waits[identifier])
+    if wait:
+        return levels, wait
+    return {key: tokens - 1 if tokens >= 1 else tokens for key, tokens in levels.items()}, 0
+
+class MemoryBuckets:
+    '''
+    Token buckets in this process, least recently used dropped past max_keys.
+    Each worker process counts on its own.
+    '''
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, keys, capacity, period, now):
+        with self._lock:
+            levels = {}
+            for key in keys:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels[key] = refill(tokens, updated, now, capacity, period)
+
+            levels, wait = take_tokens(levels, keys, capacity, period)
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+class SQLiteBuckets:
+    '''
+    Token buckets in a SQLite file, so every worker process on the host shares the same counts.
+    '''
+    def __init__(self, path, stale_after):
+        self.path = path
+        self.stale_after = stale_after
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connect()
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    @property
+    def connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def take(self, keys, capacity, period, now):
+        connection = self.connection
+        placeholders = ', '.join('?' * len(keys))
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            stored = {
+                key: (tokens, updated) for key, tokens, updated
+                in connection.execute(f'SELECT key, tokens, updated FROM buckets WHERE key IN ({placeholders})', keys)
+            }
+            levels = {key: refill(*stored.get(key, (capacity, now)), now, capacity, period) for key in keys}
+
+            levels, wait = take_tokens(levels, keys, capacity, period)
+            connection.executemany(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                [(key, tokens, now) for key, tokens in levels.items()]
+            )
+            # Buckets untouched for stale_after seconds are full again; drop them now and then so the table stays small.
+            if random.random() < 0.01:
+                connection.execute('DELETE FROM buckets WHERE updated < ?', (now - self.stale_after,))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+class Throttle:
+    '''
+    Token-bucket limits on the routes that hash passwords or look up reset codes, checked before any of that work.
+    Every attempt takes a token from the client IP's bucket and, when an identifier is given, from the bucket of
+    that IP and identifier together and from the identifier's own. See take_tokens for which of them refuse.
+    '''
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('THROTTLE_BACKEND', 'memory')
+        app.config.setdefault('THROTTLE_SQLITE_PATH', os.path.join(app.instance_path, 'throttle.db'))
+        app.config.setdefault('THROTTLE_LIMITS', THROTTLE_LIMITS)
+
+        backend = app.config['THROTTLE_BACKEND']
+        if backend == 'memory':
+            self.backend = MemoryBuckets()
+        elif backend == 'sqlite':
+            stale_after = max(period for _, period in app.config['THROTTLE_LIMITS'].values())
+            self.backend = SQLiteBuckets(app.config['THROTTLE_SQLITE_PATH'], stale_after)
+        elif backend == 'off':
+            self.backend = None
+        else:
+            raise RuntimeError(f"Unknown THROTTLE_BACKEND {backend!r}, expected memory, sqlite or off")
+
+    def hit(self, scope, remote_addr, identifier=None):
+        '''
+        Records an attempt. Returns 0 if it is allowed, otherwise the seconds until it would be.
+        '''
+        if self.backend is None:
+            return 0
+        capacity, period = self.app.config['THROTTLE_LIMITS'][scope]
+        keys = [f"{scope}:ip:{remote_addr}"]
+        if identifier:
+            identifier = identifier.strip().lower()
+            keys += [f"{scope}:pair:{remote_addr}:{identifier}", f"{scope}:id:{identifier}"]
+        return math.ceil(self.backend.take(keys, capacity, period, time.time()))
+
+throttle = Throttle()
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from helpers import week_schedule_entries
+
+def week_entries(data, week):
+    '''
+    The week's entries keyed by "<event id>@<date>", with recurring events placed on their date in that week.
+    '''
+    entries = {}
+    for event, day, day_of_week in week_schedule_entries(data, week):
+        entry = {
+            'id': event.id,
+            'date': (day or week + timedelta(days=(day_of_week + 1) % 7)).isoformat(),
+            'start': event.start.strftime('%H:%M'),
+            'end': event.end.strftime('%H:%M'),
+            'title': event.title,
+            'color': event.color,
+        }
+        if event.notes:
+            entry['notes'] = event.notes
+        if not day:
+            entry['recurring'] = True
+        entry['key'] = f"{event.id}@{entry['date']}"
+        entries[entry['key']] = entry
+    return entries
+
+def entries_version(entries):
+    return hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()[:16]
+
+class WeekSnapshots:
+    '''
+    Entries of recently served (user, week, version) triples, least recently used dropped past max_snapshots.
+    A client's since=<version> is answered with a diff when the snapshot is still here, in full otherwise.
+    '''
+    def __init__(self, max_snapshots=4096):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, week, version):
+        with self._lock:
+            key = (user_id, week, version)
+            if key in self._snapshots:
+                self._snapshots.move_to_end(key)
+            return self._snapshots.get(key)
+
+    def remember(self, user_id, week, version, entries):
+        with self._lock:
+            self._snapshots[(user_id, week, version)] = entries
+            self._snapshots.move_to_end((user_id, week, version))
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+
+week_snapshots = WeekSnapshots()
+
+def week_payload(user_id, data, week, since=None):
+    entries = week_entries(data, week)
+    version = entries_version(entries)
+    payload = {'week': week.isoformat(), 'version': version}
+
+    previous = week_snapshots.get(user_id, week, since) if since else None
+    week_snapshots.remember(user_id, week, version, entries)
+    if previous is None:
+        payload['events'] = list(entries.values())
+        return payload
+
+    payload['since'] = since
+    payload['changed'] = [entry for key, entry in entries.items() if previous.get(key) != entry]
+    payload['removed'] = [key for key in previous if key not in entries]
+    return payload